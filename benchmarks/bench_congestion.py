@@ -0,0 +1,72 @@
+"""Time congestion classification: per-edge Python rule (old) vs CongestionModel.
+
+Synthetic edge states for 10k-100k edges; "dict" includes turning the
+telemetry dict into arrays, "arrays" is the classification alone.
+
+Usage: python benchmarks/bench_congestion.py [--edges 10000 30000 100000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from congestion import CongestionModel  # noqa: E402
+from telemetry import EdgeState  # noqa: E402
+
+
+def legacy_classify(edge_states):
+    congested, colors = set(), {}
+    for edge, (count, speed, wait) in edge_states.items():
+        if (count > 5 and speed < 5.0) or wait > 10:
+            congested.add(edge)
+    for edge, state in edge_states.items():
+        if (state.count > 5 and state.speed < 5) or state.wait > 10:
+            colors[edge] = "red"
+        elif state.count > 2:
+            colors[edge] = "yellow"
+        else:
+            colors[edge] = "green"
+    return congested, colors
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edges", type=int, nargs="+", default=[10_000, 30_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'edges':>8} {'old ms':>9} {'dict ms':>9} {'arrays ms':>10}")
+    for size in args.edges:
+        ids = [f"e{i}" for i in range(size)]
+        count = rng.integers(0, 12, size)
+        speed = rng.uniform(0, 15, size)
+        wait = rng.exponential(4, size)
+        states = {e: EdgeState(int(c), float(s), float(w)) for e, c, s, w in zip(ids, count, speed, wait)}
+        model = CongestionModel(ids, alpha=0.5, hysteresis=0.2)
+
+        old_congested, _ = legacy_classify(states)
+        exact = CongestionModel(ids)
+        exact.update_states(states)
+        assert exact.congested_set() == old_congested
+
+        old_ms = best_ms(lambda: legacy_classify(states), args.repeat)
+        dict_ms = best_ms(lambda: (model.update_states(states), model.congested_set()), args.repeat)
+        array_ms = best_ms(lambda: model.update(count, speed, wait), args.repeat)
+        print(f"{size:>8} {old_ms:>9.2f} {dict_ms:>9.2f} {array_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
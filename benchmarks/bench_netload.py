@@ -0,0 +1,63 @@
+"""Network load time: sumolib + ElementTree (old startup) vs netcache cold/warm.
+
+Usage: python benchmarks/bench_netload.py [--net osm.net.xml.gz] [--repeat 5]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netcache import load_network  # noqa: E402
+
+
+def legacy_load(filename):
+    import gzip
+    import sumolib
+    net = sumolib.net.readNet(filename)
+    with gzip.open(filename) if filename.endswith(".gz") else open(filename, "rb") as f:
+        root = ET.parse(f).getroot()
+    edges = [e.get("id") for e in root.findall(".//edge") if e.get("id") and not e.get("function")]
+    return net, edges
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--net", default="osm.net.xml.gz")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cache_root = tempfile.mkdtemp()
+    cache_dir = os.path.join(cache_root, "net.cache")
+
+    def cold():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        load_network(args.net, cache_dir)
+
+    try:
+        results = {"netcache cold": best(cold, args.repeat),
+                   "netcache warm": best(lambda: load_network(args.net, cache_dir), args.repeat)}
+        try:
+            results["sumolib + ET (old)"] = best(lambda: legacy_load(args.net), args.repeat)
+        except ImportError:
+            pass
+    finally:
+        shutil.rmtree(cache_root, ignore_errors=True)
+    for name, ms in results.items():
+        print(f"{name:<20}{ms:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
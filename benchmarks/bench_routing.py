@@ -0,0 +1,106 @@
+"""Time reroute path queries: networkx + edge scan (old) vs RoutingGraph.
+
+Usage: python benchmarks/bench_routing.py [--queries 200] [--net osm.net.xml.gz]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import networkx as nx
+import sumolib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routing import RouteCache, RoutingGraph  # noqa: E402
+
+
+def legacy_path(net, graph, source_edge, dest_edge):
+    source_node = net.getEdge(source_edge).getFromNode().getID()
+    dest_node = net.getEdge(dest_edge).getFromNode().getID()
+    node_path = nx.shortest_path(graph, source=source_node, target=dest_node, weight="weight")
+    edge_path = []
+    for i in range(len(node_path) - 1):
+        for edge in net.getEdges():
+            if edge.getFromNode().getID() == node_path[i] and edge.getToNode().getID() == node_path[i + 1]:
+                edge_path.append(edge.getID())
+    return edge_path
+
+
+def path_cost(router, path):
+    if path is None:
+        return None
+    return round(sum(router.weight[router.edge_index[e]] for e in path[1:-1]), 6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--net", default="osm.net.xml.gz")
+    args = parser.parse_args()
+
+    net = sumolib.net.readNet(args.net)
+    graph = nx.DiGraph()
+    for edge in net.getEdges():
+        graph.add_edge(edge.getFromNode().getID(), edge.getToNode().getID(), weight=edge.getLength())
+    start = time.perf_counter()
+    router = RoutingGraph.from_net(net)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(42)
+    ids = router.edge_ids
+    pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(args.queries)]
+    reachable = []
+    start = time.perf_counter()
+    for s, d in pairs:
+        if router.shortest_path(s, d):
+            reachable.append((s, d))
+    new_ms = (time.perf_counter() - start) * 1000 / len(pairs)
+
+    sample = reachable[:20]
+    start = time.perf_counter()
+    for s, d in sample:
+        try:
+            legacy_path(net, graph, s, d)
+        except nx.NetworkXNoPath:
+            pass
+    old_ms = (time.perf_counter() - start) * 1000 / max(len(sample), 1)
+
+    # Vehicles reroute to their own trip destinations, so a tree per destination
+    # is built for nearly every query; it only pays off when many share one.
+    start = time.perf_counter()
+    for s, d in pairs:
+        RouteCache(router).path(s, d)
+    tree_ms = (time.perf_counter() - start) * 1000 / len(pairs)
+    dest = reachable[0][1]
+    sources = [s for s, _ in pairs]
+    cache = RouteCache(router)
+    start = time.perf_counter()
+    for s in sources:
+        cache.path(s, dest)
+    shared_ms = (time.perf_counter() - start) * 1000 / len(sources)
+    mismatched = sum(1 for s in sources
+                     if path_cost(router, cache.path(s, dest)) != path_cost(router, router.shortest_path(s, dest)))
+
+    # Congest the middle of each path and check that the next route changes.
+    changed = 0
+    for s, d in reachable[:50]:
+        path = router.shortest_path(s, d)
+        inner = path[1:-1]
+        router.set_travel_times({e: 1e6 for e in inner})
+        detour = router.shortest_path(s, d)
+        router.set_travel_times({})
+        if inner and detour != path:
+            changed += 1
+
+    print(f"graph build: {build_ms:.1f} ms ({len(router.node_ids)} nodes, {len(ids)} edges)")
+    print(f"legacy reroute:       {old_ms:8.3f} ms/query")
+    print(f"RoutingGraph reroute: {new_ms:8.3f} ms/query ({len(reachable)}/{len(pairs)} reachable)")
+    print(f"RouteCache reroute:   {tree_ms:8.3f} ms/query (own destination per query, one tree each)")
+    print(f"RouteCache reroute:   {shared_ms:8.3f} ms/query (1 shared destination, "
+          f"{cache.misses} tree build(s), {mismatched} cost mismatches)")
+    print(f"routes changed under congestion: {changed}/{min(len(reachable), 50)}")
+
+
+if __name__ == "__main__":
+    main()
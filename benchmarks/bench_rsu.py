@@ -0,0 +1,79 @@
+"""Time vehicle-to-RSU matching: per-vehicle scan of all RSUs (old) vs RSUIndex.
+
+Synthetic lanes, RSUs and vehicle positions; the old loop is timed on a
+sample of vehicles and scaled up.  Speed command packing is timed against
+a stand-in connection, so no SUMO is needed.
+
+Usage: python benchmarks/bench_rsu.py [--vehicles 10000 50000] [--rsus 5000] [--lanes 20000]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from run_sumo import RSU_RANGE, RSUIndex  # noqa: E402
+from telemetry import CommandBatch  # noqa: E402
+
+
+class BufferOnly:
+    """Just the parts of a traci Connection that CommandBatch writes to."""
+
+    def __init__(self):
+        self._queue = []
+        self._string = b""
+        self._lock = threading.RLock()
+
+
+def legacy_nearest(rsu_positions, lanes, positions):
+    hits = 0
+    for lane_id, lane_pos in zip(lanes, positions):
+        for rsu_id, (rsu_lane, rsu_pos) in rsu_positions.items():
+            if lane_id == rsu_lane and abs(lane_pos - rsu_pos) < RSU_RANGE:
+                hits += 1
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vehicles", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--rsus", type=int, default=5000)
+    parser.add_argument("--lanes", type=int, default=20_000)
+    parser.add_argument("--legacy-sample", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    lane_ids = [f"lane{i}_0" for i in range(args.lanes)]
+    rsus = [(f"rsu_{i}", lane_ids[rng.integers(args.lanes)], float(rng.uniform(1, 200))) for i in range(args.rsus)]
+    index = RSUIndex(rsus)
+    rsu_positions = {rsu_id: (lane, pos) for rsu_id, lane, pos in rsus}
+
+    print(f"{args.rsus} RSUs on {args.lanes} lanes")
+    print(f"{'vehicles':>9} {'old ms':>10} {'index ms':>9} {'commands ms':>12} {'near RSU':>9}")
+    for size in args.vehicles:
+        lanes = [lane_ids[i] for i in rng.integers(args.lanes, size=size)]
+        positions = rng.uniform(0, 200, size)
+
+        sample = min(args.legacy_sample, size)
+        start = time.perf_counter()
+        legacy_nearest(rsu_positions, lanes[:sample], positions[:sample])
+        old_ms = (time.perf_counter() - start) * 1000 * size / sample
+
+        start = time.perf_counter()
+        nearest = index.nearest(lanes, positions)
+        index_ms = (time.perf_counter() - start) * 1000
+
+        hits = np.flatnonzero(nearest >= 0)
+        commands = CommandBatch(BufferOnly())
+        start = time.perf_counter()
+        for i in hits.tolist():
+            commands.set_speed(f"veh{i}", 10.0)
+        commands_ms = (time.perf_counter() - start) * 1000
+        print(f"{size:>9} {old_ms:>10.0f} {index_ms:>9.2f} {commands_ms:>12.2f} {len(hits):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Startup time and peak RSS of the headless engine vs the GUI import set.
+
+Each mode runs in a fresh interpreter; peak RSS comes from wait4().
+Modes whose libraries are not installed are reported as skipped.
+
+Usage: python benchmarks/bench_startup.py [--repeat 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    # What `python engine.py` needs before the first step.
+    "headless": "import engine; engine.TrafficEngine()",
+    # interface.py as shipped: Tk and the engine, charts and model loaded on demand.
+    "gui (lazy)": "import interface; interface.engine = interface.TrafficEngine(gui=True)",
+    # interface.py before the split imported everything up front.
+    "gui (eager)": ("import tkinter, matplotlib.pyplot, matplotlib.backends.backend_tkagg, tensorflow.keras.models; "
+                    "import interface; interface.engine = interface.TrafficEngine(gui=True)"),
+}
+
+
+def measure(code):
+    start = time.perf_counter()
+    # Nothing reads the child's output: a pipe would fill up and block it, and
+    # wait4() reaps the child itself, which leaves communicate() nothing to wait for.
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - start
+    if status != 0:
+        return None
+    return elapsed, usage.ru_maxrss / 1024  # ru_maxrss is in KiB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'startup s':>10}{'peak RSS MiB':>14}")
+    for name, code in MODES.items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        if None in runs:
+            print(f"{name:<14}{'skipped (missing dependency)':>24}")
+            continue
+        print(f"{name:<14}{min(t for t, _ in runs):>10.2f}{max(r for _, r in runs):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare TraCI round trips and wall time per step: per-edge queries vs subscriptions.
+
+Usage: python benchmarks/bench_telemetry.py [--steps 600] [--config osm.sumocfg]
+"""
+import argparse
+import os
+import sys
+import time
+
+import traci
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from telemetry import Telemetry  # noqa: E402
+
+
+def count_round_trips(conn):
+    counter = {"calls": 0}
+    send = conn._sendExact
+
+    def counting_send():
+        counter["calls"] += 1
+        return send()
+
+    conn._sendExact = counting_send
+    return counter
+
+
+def legacy_step(edges):
+    """What interface.py did before: query every edge and vehicle individually."""
+    traci.simulationStep()
+    for edge in edges:
+        count = traci.edge.getLastStepVehicleNumber(edge)
+        traci.edge.getLastStepMeanSpeed(edge)
+        sum(traci.vehicle.getWaitingTime(v) for v in traci.edge.getLastStepVehicleIDs(edge)) / max(count, 1)
+    for vehicle_id in traci.vehicle.getIDList():
+        traci.vehicle.getSpeed(vehicle_id)
+        traci.vehicle.getRoadID(vehicle_id)
+
+
+def run(mode, config, steps):
+    traci.start(["sumo", "-c", config, "--no-warnings", "--no-step-log",
+                 "--verbose", "false", "--duration-log.statistics", "false"])
+    edges = [e for e in traci.edge.getIDList() if not e.startswith(":")]
+    if mode == "subscription":
+        feed = Telemetry(edges)
+        feed.subscribe()
+    counter = count_round_trips(traci.getConnection())
+    start = time.perf_counter()
+    for _ in range(steps):
+        if mode == "subscription":
+            traci.simulationStep()
+            feed.poll()
+        else:
+            legacy_step(edges)
+    elapsed = time.perf_counter() - start
+    traci.close()
+    return counter["calls"] / steps, elapsed / steps * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=600)
+    parser.add_argument("--config", default="osm.sumocfg")
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'calls/step':>12}{'ms/step':>10}")
+    for mode in ("legacy", "subscription"):
+        calls, ms = run(mode, args.config, args.steps)
+        print(f"{mode:<14}{calls:>12.1f}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
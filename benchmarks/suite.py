@@ -0,0 +1,297 @@
+"""Reproducible performance suite: each pipeline stage timed on real and scaled-up scenarios.
+
+Scenarios:
+    osm        the bundled OSM scenario (osm.net.xml.gz, osm.sumocfg)
+    osm-xK     the bundled network with every trip duplicated K times
+    grid-N     an N x N netgenerate grid with 4 * N * N seeded random trips
+
+For each scenario the suite times, separately: network loading (netcache
+cold/warm), trip table loading, shortest-path queries, one congestion
+classification pass, RSU placement, a headless sumo run of the engine
+(per-stage means from profiling.Profiler) and parsing the induction-loop
+output that run produced.
+
+Results are compared with benchmarks/baselines/<scenario>.json.  A timing
+more than --threshold (relative) and MIN_DELTA_MS (absolute) slower than
+its baseline, and still slower after --confirm reruns of the scenario, is
+a regression and the suite exits with status 1:
+
+    python benchmarks/suite.py                              # osm and grid-20
+    python benchmarks/suite.py osm osm-x3 grid-40 --steps 600
+    python benchmarks/suite.py osm --update-baseline        # accept the current numbers
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from copy import deepcopy
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from congestion import CongestionModel  # noqa: E402
+from detectors import ingest  # noqa: E402
+from engine import SUMO_QUIET_ARGS, TrafficEngine  # noqa: E402
+from generate_rsu import place_rsus, rsu_lanes, write_additional  # noqa: E402
+from netcache import load_network  # noqa: E402
+from routing import RoutingGraph  # noqa: E402
+from telemetry import EdgeState  # noqa: E402
+from trips import TripTable, route_files_from_config  # noqa: E402
+
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+DEFAULT_SCENARIOS = ["osm", "grid-20"]
+THRESHOLD = 0.25
+# Differences below this are timer noise, whatever the ratio.
+MIN_DELTA_MS = 0.5
+ENGINE_STAGES = ("step", "sumo_step", "traci_io", "telemetry", "detect", "route_weights", "vehicle_update",
+                 "reroute")
+SEED = 42
+
+SUMOCFG = """<configuration>
+    <input>
+        <net-file value="{net}"/>
+        <route-files value="{routes}"/>
+    </input>
+    <processing>
+        <ignore-route-errors value="true"/>
+    </processing>
+</configuration>
+"""
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def write_config(path, net_file, route_files):
+    with open(path, "w") as f:
+        f.write(SUMOCFG.format(net=net_file, routes=",".join(route_files)))
+    return path
+
+
+def duplicate_trips(src, dst, copies):
+    """Copy a route file with every trip and vehicle repeated copies times right after itself."""
+    tree = ET.parse(src)
+    root = tree.getroot()
+    children = []
+    for elem in root:
+        children.append(elem)
+        if elem.tag in ("trip", "vehicle"):
+            for k in range(1, copies):
+                copy = deepcopy(elem)
+                copy.set("id", f"{elem.get('id')}#{k}")
+                children.append(copy)
+    root[:] = children
+    tree.write(dst, encoding="UTF-8", xml_declaration=True)
+
+
+def random_trips(net, path, count, horizon, seed=SEED):
+    """count trips between random distinct edges, departing uniformly over [0, horizon)."""
+    rng = np.random.default_rng(seed)
+    edges = net.edge_ids.tolist()
+    origin = rng.integers(len(edges), size=count)
+    destination = (origin + rng.integers(1, len(edges), size=count)) % len(edges)
+    depart = np.sort(rng.uniform(0, horizon, size=count))
+    with open(path, "w") as f:
+        f.write("<routes>\n")
+        for i, (a, b, t) in enumerate(zip(origin.tolist(), destination.tolist(), depart.tolist())):
+            f.write(f'    <trip id="t{i}" depart="{t:.2f}" from="{edges[a]}" to="{edges[b]}"/>\n')
+        f.write("</routes>\n")
+
+
+def prepare(name, work_dir):
+    """(net file, sumo config) of a scenario, generating what it needs in work_dir."""
+    if name == "osm":
+        return os.path.join(ROOT, "osm.net.xml.gz"), os.path.join(ROOT, "osm.sumocfg")
+    if name.startswith("osm-x"):
+        copies = int(name[len("osm-x"):])
+        routes = []
+        for src in route_files_from_config(os.path.join(ROOT, "osm.sumocfg")):
+            dst = os.path.join(work_dir, os.path.basename(src))
+            duplicate_trips(src, dst, copies)
+            routes.append(dst)
+        net_file = os.path.join(ROOT, "osm.net.xml.gz")
+        return net_file, write_config(os.path.join(work_dir, "bench.sumocfg"), net_file, routes)
+    if name.startswith("grid-"):
+        size = int(name[len("grid-"):])
+        net_file = os.path.join(work_dir, f"{name}.net.xml.gz")
+        subprocess.run(["netgenerate", "--grid", "--grid.number", str(size), "--grid.length", "150",
+                        "--no-turnarounds", "--seed", str(SEED), "-o", net_file],
+                       check=True, stdout=subprocess.DEVNULL)
+        routes = os.path.join(work_dir, f"{name}.trips.xml")
+        random_trips(load_network(net_file, os.path.join(work_dir, "net.cache")), routes, 4 * size * size, 600)
+        return net_file, write_config(os.path.join(work_dir, "bench.sumocfg"), net_file, [routes])
+    raise ValueError(f"unknown scenario {name!r} (osm, osm-xK or grid-N)")
+
+
+def run_scenario(name, steps, repeat, queries):
+    """{"results": {metric: ms}, "info": {...}} for one scenario."""
+    work_dir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    try:
+        net_file, config = prepare(name, work_dir)
+        results, info = {}, {}
+        cache_dir = os.path.join(work_dir, "bench.net.cache")
+
+        def cold_net():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            load_network(net_file, cache_dir)
+
+        results["net_load_cold_ms"] = best_ms(cold_net, repeat)
+        results["net_load_warm_ms"] = best_ms(lambda: load_network(net_file, cache_dir), repeat)
+        net = load_network(net_file, cache_dir)
+        info["edges"], info["junctions"] = len(net.edge_ids), len(net.node_ids)
+
+        route_files = route_files_from_config(config)
+        trips_cache = os.path.join(work_dir, "trips.cache")
+
+        def cold_trips():
+            shutil.rmtree(trips_cache, ignore_errors=True)
+            TripTable(route_files, trips_cache).load()
+
+        results["trip_load_cold_ms"] = best_ms(cold_trips, repeat)
+        results["trip_load_warm_ms"] = best_ms(lambda: TripTable(route_files, trips_cache).load(), repeat)
+        info["trips"] = len(TripTable(route_files, trips_cache))
+
+        router = RoutingGraph.from_compiled(net)
+        rng = np.random.default_rng(SEED)
+        edges = net.edge_ids.tolist()
+        pairs = [(edges[a], edges[b]) for a, b in rng.integers(len(edges), size=(queries, 2)).tolist()]
+        results["route_query_ms"] = best_ms(lambda: [router.shortest_path(a, b) for a, b in pairs],
+                                            repeat) / queries
+
+        model = CongestionModel(net.edge_ids, net.edge_type, alpha=0.5, hysteresis=0.2)
+        counts = rng.integers(0, 12, size=len(edges)).tolist()
+        speeds = rng.uniform(0, 15, size=len(edges)).tolist()
+        waits = rng.uniform(0, 20, size=len(edges)).tolist()
+        states = {e: EdgeState(c, s, w) for e, c, s, w in zip(edges, counts, speeds, waits)}
+        results["congestion_update_ms"] = best_ms(lambda: [model.update_states(states) for _ in range(20)],
+                                                  repeat) / 20
+
+        results["rsu_placement_ms"] = best_ms(lambda: rsu_lanes(net, place_rsus(net)), repeat)
+        placements = rsu_lanes(net, place_rsus(net))
+        info["rsus"] = len(placements)
+
+        # Detector output paths are relative to the additional file, i.e. inside work_dir.
+        additional = os.path.join(work_dir, "rsu.add.xml")
+        write_additional(placements, additional, detector_file="detectors.xml")
+        sumo_args = SUMO_QUIET_ARGS + ["--no-warnings", "--additional-files", additional, "--seed", str(SEED)]
+        engine = TrafficEngine(net_file, config, label=f"bench-{name}", sumo_args=sumo_args,
+                               trips=TripTable(route_files, trips_cache))
+        engine.start()
+        started = time.perf_counter()
+        try:
+            info["steps"] = engine.run(steps)
+        finally:
+            engine.close()
+        info["engine_wall_s"] = round(time.perf_counter() - started, 2)
+        info["reroutes"] = engine.rerouted_total
+        for row in engine.profiler.stage_rows():
+            if row["stage"] in ENGINE_STAGES:
+                results[f"engine_{row['stage']}_ms"] = row["mean_ms"]
+
+        detector_file = os.path.join(work_dir, "detectors.xml")
+        store = os.path.join(work_dir, "detector_store")
+        results["detector_parse_ms"] = best_ms(lambda: ingest(detector_file, store), repeat)
+        info["detector_records"] = ingest(detector_file, store)
+        return {"results": {k: round(v, 4) for k, v in results.items()}, "info": info}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def machine():
+    try:
+        sumo = subprocess.run(["sumo", "--version"], capture_output=True, text=True).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        sumo = None
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count(),
+            "sumo": sumo}
+
+
+def compare(results, baseline, threshold):
+    """[(metric, baseline ms, current ms, ratio, regressed)] for metrics present in both."""
+    rows = []
+    for metric, current in results.items():
+        base = baseline.get(metric)
+        if base is None:
+            continue
+        ratio = current / base if base else float("inf")
+        regressed = current > base * (1 + threshold) and current - base > MIN_DELTA_MS
+        rows.append((metric, base, current, ratio, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", default=DEFAULT_SCENARIOS, help="osm, osm-xK or grid-N")
+    parser.add_argument("--steps", type=int, default=300, help="engine steps per scenario")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timing; the best one counts")
+    parser.add_argument("--queries", type=int, default=200, help="shortest-path queries per run")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed relative slowdown")
+    parser.add_argument("--baseline-dir", default=BASELINE_DIR)
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baselines")
+    parser.add_argument("--confirm", type=int, default=1,
+                        help="reruns of a scenario that regressed; each metric keeps its best time")
+    parser.add_argument("--out", help="also write all results to this JSON file")
+    args = parser.parse_args()
+
+    host = machine()
+    report = {}
+    regressions = 0
+    for name in args.scenarios:
+        print(f"== {name}")
+        run = dict(run_scenario(name, args.steps, args.repeat, args.queries), machine=host, steps=args.steps)
+        report[name] = run
+        print("   " + ", ".join(f"{k}={v}" for k, v in run["info"].items()))
+        baseline_path = os.path.join(args.baseline_dir, f"{name}.json")
+        baseline = None
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        if baseline is None:
+            rows = [(metric, None, ms, None, False) for metric, ms in run["results"].items()]
+        else:
+            rows = compare(run["results"], baseline["results"], args.threshold)
+            for attempt in range(args.confirm):
+                if not any(row[-1] for row in rows):
+                    break
+                # One slow run is often just a busy machine; a real regression shows up again.
+                print(f"   regression seen, confirming ({attempt + 1}/{args.confirm})")
+                rerun = run_scenario(name, args.steps, args.repeat, args.queries)["results"]
+                run["results"] = {k: min(v, rerun.get(k, v)) for k, v in run["results"].items()}
+                rows = compare(run["results"], baseline["results"], args.threshold)
+            if baseline.get("machine") != host or baseline.get("steps") != args.steps:
+                print(f"   note: baseline was recorded with a different machine or --steps ({baseline_path})")
+        print(f"   {'metric':<28}{'baseline':>11}{'current':>11}{'ratio':>8}")
+        for metric, base, current, ratio, regressed in rows:
+            base_text = f"{base:>11.3f}" if base is not None else f"{'-':>11}"
+            ratio_text = f"{ratio:>8.2f}" if ratio is not None else f"{'-':>8}"
+            print(f"   {metric:<28}{base_text}{current:>11.3f}{ratio_text}{'  REGRESSION' if regressed else ''}")
+            regressions += regressed
+        if args.update_baseline:
+            os.makedirs(args.baseline_dir, exist_ok=True)
+            with open(baseline_path, "w") as f:
+                json.dump(run, f, indent=1)
+            print(f"   baseline written to {baseline_path}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    if regressions and not args.update_baseline:
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
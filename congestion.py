@@ -0,0 +1,121 @@
+"""Vectorized congestion classification over per-edge NumPy arrays.
+
+All edges are classified in one pass.  Count, mean speed and mean wait are
+held in contiguous arrays, optionally smoothed with an EWMA, and an edge
+becomes congested when
+
+    (count > min_count and speed < max_speed) or wait > max_wait
+
+With hysteresis h it stays congested until the relaxed rule (count above
+min_count * (1 - h), speed below max_speed * (1 + h), wait above
+max_wait * (1 - h)) no longer holds, so edges near a threshold do not
+flap.  The same pass yields the colour class used by the network canvas.
+
+Thresholds can differ per road class (the SUMO edge type).  A JSON file
+maps an edge type ("highway.trunk") or its class ("trunk") to overrides of
+the defaults:
+
+    {"default": {"min_count": 5}, "trunk": {"max_speed": 8.0, "max_wait": 15}}
+"""
+import json
+from collections import namedtuple
+from itertools import chain, repeat
+from operator import itemgetter
+
+import numpy as np
+
+# Colour classes; UNKNOWN marks edges without data yet.
+UNKNOWN, FREE, BUSY, CONGESTED = -1, 0, 1, 2
+CLASS_COLORS = {UNKNOWN: "gray", FREE: "green", BUSY: "yellow", CONGESTED: "red"}
+
+# busy_count: vehicles above which a non-congested edge is drawn as busy
+Thresholds = namedtuple("Thresholds", ["min_count", "max_speed", "max_wait", "busy_count"])
+DEFAULT_THRESHOLDS = Thresholds(min_count=5, max_speed=5.0, max_wait=10.0, busy_count=2)
+
+_ZERO = (0, 0.0, 0.0)
+
+
+def load_thresholds(path):
+    """Read a {road class: {field: value}} JSON file into {road class: Thresholds}."""
+    with open(path) as f:
+        raw = json.load(f)
+    default = DEFAULT_THRESHOLDS._replace(**raw.pop("default", {}))
+    thresholds = {road_class: default._replace(**values) for road_class, values in raw.items()}
+    thresholds["default"] = default
+    return thresholds
+
+
+class CongestionModel:
+    """Per-edge state, smoothing and classification for a fixed edge list.
+
+    alpha: EWMA weight of the newest sample (1.0 disables smoothing)
+    hysteresis: relative margin an edge must clear to leave the congested state
+    """
+
+    def __init__(self, edge_ids, edge_types=None, thresholds=None, alpha=1.0, hysteresis=0.0):
+        self.edge_ids = np.asarray(edge_ids)
+        self._ids = self.edge_ids.tolist()
+        self._get_all = itemgetter(*self._ids) if len(self._ids) > 1 else None
+        size = len(self._ids)
+        self.alpha = alpha
+        self.hysteresis = hysteresis
+
+        thresholds = dict(thresholds or {})
+        default = thresholds.get("default", DEFAULT_THRESHOLDS)
+        if edge_types is None:
+            edge_types = [""] * size
+        per_edge = np.array([thresholds.get(t) or thresholds.get(t.rpartition(".")[2]) or default
+                             for t in edge_types], dtype=np.float64).reshape(size, 4)
+        self.min_count, self.max_speed, self.max_wait, self.busy_count = per_edge.T.copy()
+        self.reset()
+
+    def reset(self):
+        """Forget every sample, e.g. before a new run."""
+        size = len(self._ids)
+        self.count = np.zeros(size)
+        self.speed = np.zeros(size)
+        self.wait = np.zeros(size)
+        self.congested = np.zeros(size, dtype=bool)
+        self.classes = np.full(size, UNKNOWN, dtype=np.int8)
+        self.samples = 0
+        self.transitions = 0  # edges entering or leaving congestion, summed over all updates
+
+    def update(self, count, speed, wait):
+        """Fold one sample per edge into the state and reclassify; returns the congested mask."""
+        if self.samples == 0 or self.alpha >= 1.0:
+            self.count[:], self.speed[:], self.wait[:] = count, speed, wait
+        else:
+            a = self.alpha
+            for state, sample in ((self.count, count), (self.speed, speed), (self.wait, wait)):
+                state *= 1.0 - a
+                state += a * np.asarray(sample, dtype=np.float64)
+        self.samples += 1
+
+        c, s, w = self.count, self.speed, self.wait
+        enter = ((c > self.min_count) & (s < self.max_speed)) | (w > self.max_wait)
+        if self.hysteresis:
+            h = self.hysteresis
+            stay = ((c > self.min_count * (1 - h)) & (s < self.max_speed * (1 + h))) | (w > self.max_wait * (1 - h))
+            congested = np.where(self.congested, stay, enter)
+        else:
+            congested = enter
+        self.transitions += int(np.count_nonzero(congested != self.congested))
+        self.congested = congested
+
+        classes = np.where(c > self.busy_count, BUSY, FREE).astype(np.int8)
+        classes[congested] = CONGESTED
+        self.classes = classes
+        return congested
+
+    def update_states(self, states):
+        """update() from a telemetry {edge_id: EdgeState} dict; missing edges count as empty."""
+        try:
+            rows = self._get_all(states)
+        except (KeyError, TypeError):
+            rows = map(states.get, self._ids, repeat(_ZERO))
+        flat = chain.from_iterable(rows)
+        values = np.fromiter(flat, dtype=np.float64, count=3 * len(self._ids)).reshape(-1, 3)
+        return self.update(values[:, 0], values[:, 1], values[:, 2])
+
+    def congested_set(self):
+        return frozenset(self.edge_ids[self.congested].tolist())
@@ -0,0 +1,172 @@
+"""Streaming ingestion of RSU induction-loop output into columnar shards.
+
+SUMO writes one <interval> per RSU and aggregation period to
+detector_output.xml.  The file is read incrementally with an
+XMLPullParser, so it can be followed while SUMO is still writing it, and
+every element is discarded once read.  Records are collected into fixed
+size column buffers and written as .npy shards, so memory stays bounded
+however long the run is:
+
+    python detectors.py detector_output.xml --out detector_store [--follow]
+
+Layout of the store: rsu_ids.json plus shard_NNNNN/<column>.npy, where
+the rsu column indexes into rsu_ids.json.  A speed of -1 (no vehicle in
+the interval) is stored as NaN.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+COLUMNS = {
+    "rsu": np.int32,
+    "begin": np.float64,
+    "end": np.float64,
+    "n_vehicles": np.int32,
+    "flow": np.float32,
+    "occupancy": np.float32,
+    "speed": np.float32,
+}
+
+
+class DetectorStore:
+    """Append-only writer of interval records, flushed in shards of chunk_size rows."""
+
+    def __init__(self, out_dir, chunk_size=100_000):
+        self.out_dir = out_dir
+        self.chunk_size = chunk_size
+        os.makedirs(out_dir, exist_ok=True)
+        self.rsu_ids = _read_rsu_ids(out_dir)
+        self.rsu_index = {r: i for i, r in enumerate(self.rsu_ids)}
+        self.shard = len([d for d in os.listdir(out_dir) if d.startswith("shard_")])
+        self.buffers = {name: np.empty(chunk_size, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0
+        self.records = 0
+
+    def add(self, rsu_id, begin, end, n_vehicles, flow, occupancy, speed):
+        rsu = self.rsu_index.get(rsu_id)
+        if rsu is None:
+            rsu = self.rsu_index[rsu_id] = len(self.rsu_ids)
+            self.rsu_ids.append(rsu_id)
+        i = self.size
+        b = self.buffers
+        b["rsu"][i] = rsu
+        b["begin"][i] = begin
+        b["end"][i] = end
+        b["n_vehicles"][i] = n_vehicles
+        b["flow"][i] = flow
+        b["occupancy"][i] = occupancy
+        b["speed"][i] = speed if speed >= 0 else np.nan
+        self.size += 1
+        self.records += 1
+        if self.size == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.size:
+            shard_dir = os.path.join(self.out_dir, f"shard_{self.shard:05d}")
+            os.makedirs(shard_dir, exist_ok=True)
+            for name, buffer in self.buffers.items():
+                np.save(os.path.join(shard_dir, name + ".npy"), buffer[:self.size])
+            self.shard += 1
+            self.size = 0
+        with open(os.path.join(self.out_dir, "rsu_ids.json"), "w") as f:
+            json.dump(self.rsu_ids, f)
+
+
+def _read_rsu_ids(out_dir):
+    try:
+        with open(os.path.join(out_dir, "rsu_ids.json")) as f:
+            return json.load(f)
+    except OSError:
+        return []
+
+
+def ingest(xml_path, out_dir, follow=False, chunk_size=100_000, poll_interval=0.5, idle_timeout=None,
+           append=False):
+    """Read xml_path into the store at out_dir; returns the number of records.
+
+    With follow=True the file is tailed until SUMO closes the root element,
+    or until nothing new arrived for idle_timeout seconds.  An existing store
+    is replaced unless append is set.
+    """
+    if not append and os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    store = DetectorStore(out_dir, chunk_size)
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    done = False
+    last_data = time.monotonic()
+    with open(xml_path, "rb") as f:
+        while not done:
+            data = f.read(1 << 16)
+            if not data:
+                if not follow or (idle_timeout is not None and time.monotonic() - last_data > idle_timeout):
+                    break
+                time.sleep(poll_interval)
+                continue
+            last_data = time.monotonic()
+            parser.feed(data)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    continue
+                if elem is root:
+                    done = True
+                elif elem.tag == "interval":
+                    a = elem.attrib
+                    store.add(a["id"], float(a["begin"]), float(a["end"]), int(a["nVehContrib"]),
+                              float(a["flow"]), float(a["occupancy"]), float(a["speed"]))
+                    root.remove(elem)
+    store.flush()
+    return store.records
+
+
+def load_store(out_dir, mmap=True):
+    """Concatenate all shards: returns (rsu_ids, {column: array})."""
+    rsu_ids = _read_rsu_ids(out_dir)
+    shards = sorted(d for d in os.listdir(out_dir) if d.startswith("shard_"))
+    columns = {}
+    for name in COLUMNS:
+        parts = [np.load(os.path.join(out_dir, s, name + ".npy"), mmap_mode="r" if mmap else None) for s in shards]
+        columns[name] = np.concatenate(parts) if parts else np.empty(0, dtype=COLUMNS[name])
+    return rsu_ids, columns
+
+
+def per_rsu(out_dir):
+    """{rsu_id: {column: array}} with each RSU's records in time order."""
+    rsu_ids, columns = load_store(out_dir)
+    order = np.lexsort((columns["begin"], columns["rsu"]))
+    rsu_sorted = columns["rsu"][order]
+    bounds = np.searchsorted(rsu_sorted, np.arange(len(rsu_ids) + 1))
+    result = {}
+    for i, rsu_id in enumerate(rsu_ids):
+        rows = order[bounds[i]:bounds[i + 1]]
+        result[rsu_id] = {name: columns[name][rows] for name in COLUMNS if name != "rsu"}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest SUMO induction-loop output into .npy shards.")
+    parser.add_argument("xml", nargs="?", default="detector_output.xml")
+    parser.add_argument("--out", default="detector_store")
+    parser.add_argument("--follow", action="store_true", help="keep reading while SUMO writes the file")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="with --follow, stop after this many seconds without new data")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--append", action="store_true", help="add to an existing store instead of replacing it")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records = ingest(args.xml, args.out, args.follow, args.chunk_size, idle_timeout=args.idle_timeout,
+                     append=args.append)
+    print(f"{records} records from {args.xml} into {args.out} in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
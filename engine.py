@@ -0,0 +1,433 @@
+"""Headless monitoring and rerouting engine.
+
+This module holds everything the simulation loop needs (network, routing,
+telemetry, congestion detection and rerouting) without importing Tk,
+matplotlib or TensorFlow, so it can run on machines without a display:
+
+    python engine.py --steps 3600 --metrics metrics.csv
+
+With --predict the LSTM model (prediction.py) runs in its own thread and
+edges it expects to congest are made more expensive for routing before
+they actually jam.
+
+Each stage of a step is timed by a profiling.Profiler; --profile writes
+the histograms and TraCI counters at the end, --prometheus-port serves
+them while the run is going.
+
+Rerouting goes through a scheduler.RerouteScheduler: at most
+--reroute-budget vehicles per step, longest waiting first, spread over
+--alternatives paths.  The routing weights and the reroutes are queued in
+one CommandBatch that reaches SUMO with the next simulationStep.
+
+--record DIR writes every frame to a replay.py recording, which the GUI
+and offline analysis can play back without SUMO.
+
+interface.py drives the same engine from a worker thread and only adds
+the GUI on top of it.
+"""
+import argparse
+import csv
+import queue
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter, namedtuple
+
+import traci
+
+from congestion import CongestionModel, load_thresholds
+from netcache import load_network
+from profiling import Profiler, instrument_connection
+from routing import RouteCache, RoutingGraph
+from scheduler import ALTERNATIVES, REROUTE_BUDGET, RerouteScheduler
+from telemetry import CommandBatch, Telemetry
+from trips import TripTable, route_files_from_config
+
+# Immutable per-step result of the engine.
+# classes: per-edge congestion class (congestion.FREE/BUSY/CONGESTED), in engine.edges order
+# reroutes: ((vehicle_id, old_route, new_route), ...) decided since the previous frame
+# arrived: vehicles that left the simulation since the previous frame
+Frame = namedtuple("Frame", ["snapshot", "congested", "classes", "reroutes", "arrived", "latest_rerouted",
+                             "step_rate"])
+
+METRIC_FIELDS = ["step", "time", "vehicles", "congested_edges", "predicted_edges", "reroutes", "rerouted_total",
+                 "deferred", "step_ms"]
+
+# Routing weight of an edge the model expects to congest: free_time * (1 + PREDICTED_PENALTY * probability)
+PREDICTED_PENALTY = 2.0
+
+# Routing weights are sent to SUMO again only once they are off by more than this fraction.
+WEIGHT_TOLERANCE = 0.1
+
+# Keeps SUMO quiet when stdout is shared with other runs or a progress display.
+SUMO_QUIET_ARGS = ["--no-step-log", "--duration-log.statistics", "false", "--verbose", "false"]
+
+# Congestion smoothing: EWMA weight of the newest sample and the hysteresis margin (see congestion.py)
+SMOOTHING = 0.5
+HYSTERESIS = 0.2
+
+
+class TrafficEngine:
+    """One SUMO run: network model, live state and the per-step control logic."""
+
+    def __init__(self, net_file="osm.net.xml.gz", config="osm.sumocfg", gui=False, label="default", sumo_args=(),
+                 predictor=None, thresholds=None, smoothing=SMOOTHING, hysteresis=HYSTERESIS, trips=None,
+                 profiler=None, recorder=None, reroute_budget=REROUTE_BUDGET, alternatives=ALTERNATIVES):
+        self.config = config
+        self.gui = gui
+        self.label = label
+        self.sumo_args = list(sumo_args)
+        self.net = load_network(net_file)
+        self.edges = self.net.edge_ids.tolist()
+        self.trips = trips if trips is not None else TripTable(route_files_from_config(config))
+        self.router = RoutingGraph.from_compiled(self.net)
+        self.route_cache = RouteCache(self.router)
+        self.scheduler = RerouteScheduler(self.router, self.route_cache, reroute_budget, alternatives)
+        # Optional prediction.PredictionService; its edge order is self.edges.
+        self.predictor = predictor
+        self.congestion = CongestionModel(self.net.edge_ids, self.net.edge_type, thresholds, smoothing, hysteresis)
+        self.profiler = profiler if profiler is not None else Profiler()
+        # Optional replay.Recorder that every frame is appended to.
+        self.recorder = recorder
+
+        self.conn = None
+        self.telemetry = None
+        self.commands = None
+        self.reset()
+
+    def reset(self):
+        """Start the per-run state over: live state, congestion history, routing weights and reroutes."""
+        # edge -> travel time last sent to SUMO
+        self.sumo_weights = {}
+        self.snapshot = None
+        self.congested_edges = frozenset()
+        self.vehicles_data = {}
+        # Only vehicles still in the simulation; rerouted_total counts every reroute.
+        self.rerouted_vehicles = {}
+        self.rerouted_total = 0
+        self.latest_rerouted_vehicle = None
+        self.pending_reroutes = []
+        self.reroutes_deferred = 0  # candidates left waiting in the last step
+        self._rate_steps, self._rate_start, self.step_rate = 0, time.perf_counter(), 0.0
+        self.congestion.reset()
+        self.router.set_travel_times({})
+        self.scheduler.reset()
+        if self.predictor is not None:
+            self.predictor.reset()
+
+    def start(self):
+        """Launch SUMO and subscribe; a restarted engine begins a new run from scratch."""
+        self.reset()
+        sumo_cmd = ["sumo-gui" if self.gui else "sumo", "-c", self.config] + self.sumo_args
+        if self.gui:
+            sumo_cmd.append("--start")
+        threading.Thread(target=self.load_trips, daemon=True).start()
+        traci.start(sumo_cmd, label=self.label)
+        self.conn = traci.getConnection(self.label)
+        instrument_connection(self.conn, self.profiler)
+        self.telemetry = Telemetry(self.edges, self.conn)
+        self.telemetry.subscribe()
+        self.commands = CommandBatch(self.conn)
+        # The predictor outlives a stop/start of SUMO so the model is loaded only once.
+        if self.predictor is not None and self.predictor.ident is None:
+            self.predictor.start()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    @property
+    def finished(self):
+        return self.snapshot is not None and self.snapshot.expected == 0
+
+    def step(self):
+        """Advance SUMO by one step, run detection and rerouting, return the Frame."""
+        profiler = self.profiler
+        with profiler.step():
+            with profiler.stage("sumo_step"):
+                try:
+                    self.conn.simulationStep()
+                except traci.exceptions.TraCIException as e:
+                    # SUMO rejected a queued command but ran the step anyway; traci dropped
+                    # the rest of the answer, the step's subscription results with it.
+                    print(f"SUMO rejected a command ({e}); continuing.")
+                    profiler.count("commands_rejected")
+                    self.telemetry.resubscribe()
+            with profiler.stage("telemetry"):
+                self.snapshot = self.telemetry.poll()
+            if self.predictor is not None:
+                self.predictor.observe(self.snapshot)
+            with profiler.stage("detect"):
+                self.detect_congestion()
+            with profiler.stage("route_weights"):
+                self.update_route_weights()
+            with profiler.stage("vehicle_update"):
+                self.update_vehicle_data()
+            for vehicle_id in self.snapshot.arrived:
+                self.rerouted_vehicles.pop(vehicle_id, None)
+
+        self._rate_steps += 1
+        now = time.perf_counter()
+        if now - self._rate_start >= 1.0:
+            self.step_rate = self._rate_steps / (now - self._rate_start)
+            self._rate_steps, self._rate_start = 0, now
+        reroutes = tuple(self.pending_reroutes)
+        self.pending_reroutes.clear()
+        frame = Frame(self.snapshot, self.congested_edges, self.congestion.classes, reroutes, self.snapshot.arrived,
+                      self.latest_rerouted_vehicle, self.step_rate)
+        if self.recorder is not None:
+            with profiler.stage("record"):
+                self.recorder.append(frame)
+        return frame
+
+    def detect_congestion(self):
+        self.congestion.update_states(self.snapshot.edges)
+        self.congested_edges = self.congestion.congested_set()
+
+    def update_route_weights(self):
+        edge_states = self.snapshot.edges
+        updates = {edge: self.router.travel_time(edge, edge_states[edge].speed, edge_states[edge].wait)
+                   for edge in self.congested_edges}
+        if self.predictor is not None:
+            probabilities = self.predictor.probabilities
+            for edge in self.predictor.predicted - self.congested_edges:
+                i = self.router.edge_index[edge]
+                updates[edge] = self.router.free_time[i] * (1 + PREDICTED_PENALTY * float(probabilities[i]))
+        self.router.set_travel_times(updates)
+        self.send_route_weights(updates)
+
+    def send_route_weights(self, updates):
+        """Queue the travel times that changed for SUMO, which does the actual routing."""
+        sent, commands, router = self.sumo_weights, self.commands, self.router
+        for edge, seconds in updates.items():
+            previous = sent.get(edge)
+            if previous is None or abs(seconds - previous) > WEIGHT_TOLERANCE * previous:
+                commands.adapt_travel_time(edge, seconds)
+                sent[edge] = seconds
+        for edge in [edge for edge in sent if edge not in updates]:
+            commands.adapt_travel_time(edge, router.free_time[router.edge_index[edge]])
+            del sent[edge]
+
+    def update_vehicle_data(self):
+        new_data = {}
+        # (waiting time, edge waiting time, vehicle) of every vehicle on a congested edge not rerouted yet
+        candidates = []
+        destinations = {}
+        congested, edge_states, rerouted = self.congested_edges, self.snapshot.edges, self.rerouted_vehicles
+        edge_index = self.router.edge_index
+        for vehicle_id, state in self.snapshot.vehicles.items():
+            speed, edge = state.speed, state.edge
+            new_data[vehicle_id] = (speed, edge)
+            if edge in congested and vehicle_id not in rerouted:
+                destination = self.vehicle_destination(vehicle_id, state)
+                # A vehicle already on its destination edge has nowhere to be rerouted to,
+                # and one whose destination is unknown keeps its route.
+                if destination != edge and destination in edge_index:
+                    destinations[vehicle_id] = destination
+                    candidates.append((state.wait, edge_states[edge].wait, vehicle_id))
+        self.vehicles_data = new_data
+        self.reroutes_deferred = 0
+        if candidates:
+            with self.profiler.stage("reroute"):
+                self.reroute_vehicles(candidates, destinations)
+        self.profiler.count("reroutes_deferred", self.reroutes_deferred)
+        self.commands.flush()
+
+    def load_trips(self):
+        """Load the trip table now instead of on the first reroute; False if it is unavailable."""
+        trips = self.trips
+        if trips is None:
+            return False
+        try:
+            trips.load()
+            return True
+        except (OSError, ET.ParseError) as e:
+            print(f"Trip files not loaded ({e}); destinations come from the vehicles' routes only.")
+            self.trips = None
+            return False
+
+    def vehicle_destination(self, vehicle_id, state):
+        """The last edge of the vehicle's route, else its trip's destination; None if neither is known.
+
+        The route covers every vehicle SUMO runs, including the copies made by
+        --scale and vehicles that reference a named route, neither of which
+        is in the trip table.
+        """
+        if state.route:
+            return state.route[-1]
+        trips = self.trips
+        if trips is not None and self.load_trips():
+            destination = trips.destination(vehicle_id)
+            if destination in self.router.edge_index:
+                return destination
+        return None
+
+    def find_shortest_path(self, source_edge, dest_edge):
+        return self.router.shortest_path(source_edge, dest_edge)
+
+    def reroute_vehicles(self, candidates, destinations):
+        """Reroute the candidates the scheduler admits; the commands reach SUMO with the next simulationStep.
+
+        destinations: vehicle id -> destination edge of every candidate.
+        """
+        vehicles, commands, scheduler = self.snapshot.vehicles, self.commands, self.scheduler
+        # Vehicles mostly have destinations of their own, which a per-destination
+        # tree does not pay off for; only those several candidates share use the route cache.
+        sharing = Counter(destinations.values())
+
+        def plan(vehicle_id):
+            destination = destinations[vehicle_id]
+            return scheduler.assign(vehicles[vehicle_id].edge, destination, shared=sharing[destination] > 1)
+
+        plans = scheduler.admit(candidates, plan)
+        self.reroutes_deferred = scheduler.deferred
+        for vehicle_id, (new_path, avoid) in plans:
+            # The old route comes with the subscription, so rerouting needs no reads at all.
+            old_route = vehicles[vehicle_id].route
+            for edge, seconds in avoid:
+                commands.set_vehicle_travel_time(vehicle_id, edge, seconds)
+            commands.change_target(vehicle_id, destinations[vehicle_id])
+            self.pending_reroutes.append((vehicle_id, tuple(old_route), tuple(new_path)))
+            self.rerouted_vehicles[vehicle_id] = {"old": old_route, "new": new_path}
+        if plans:
+            self.rerouted_total += len(plans)
+            self.profiler.count("reroutes", len(plans))
+            self.latest_rerouted_vehicle = plans[-1][0]
+
+    def run(self, max_steps=None, metrics_file=None):
+        """Step until the scenario ends (or max_steps), optionally writing per-step metrics as CSV."""
+        writer = None
+        if metrics_file:
+            out = open(metrics_file, "w", newline="")
+            writer = csv.writer(out)
+            writer.writerow(METRIC_FIELDS)
+        steps = 0
+        try:
+            while not self.finished and (max_steps is None or steps < max_steps):
+                start = time.perf_counter()
+                frame = self.step()
+                steps += 1
+                if writer:
+                    snap = frame.snapshot
+                    predicted = len(self.predictor.predicted) if self.predictor is not None else 0
+                    writer.writerow([snap.step, snap.time, len(snap.vehicles), len(frame.congested), predicted,
+                                     len(frame.reroutes), self.rerouted_total, self.reroutes_deferred,
+                                     f"{(time.perf_counter() - start) * 1000:.3f}"])
+        finally:
+            if writer:
+                out.close()
+        return steps
+
+
+class SimulationWorker(threading.Thread):
+    """Steps the engine as fast as it can and publishes one Frame per step.
+
+    Only this thread talks to TraCI.  The queue is bounded: when the consumer
+    falls behind, the oldest frame is dropped and its reroute events are
+    carried over into the newer one so no reroute or arrival is lost.
+    """
+
+    def __init__(self, engine, max_frames=4):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.frames = queue.Queue(maxsize=max_frames)
+        self.stop_event = threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set() and not self.engine.finished:
+                self.publish(self.engine.step())
+        except traci.exceptions.FatalTraCIError:
+            self.error = "TraCI not connected! Restart SUMO."
+        except Exception as e:
+            self.error = f"Simulation error: {e}"
+
+    def publish(self, frame):
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    stale = self.frames.get_nowait()
+                except queue.Empty:
+                    continue
+                frame = frame._replace(reroutes=stale.reroutes + frame.reroutes,
+                                       arrived=stale.arrived + frame.arrived)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the congestion monitoring/rerouting loop headless.")
+    parser.add_argument("-c", "--config", default="osm.sumocfg", help="SUMO configuration file")
+    parser.add_argument("-n", "--net", default="osm.net.xml.gz", help="network used for routing")
+    parser.add_argument("--steps", type=int, default=None, help="stop after this many steps (default: run to completion)")
+    parser.add_argument("--metrics", default="metrics.csv", help="per-step metrics CSV")
+    parser.add_argument("--gui", action="store_true", help="use sumo-gui instead of sumo")
+    parser.add_argument("--thresholds", help="JSON file with per-road-class congestion thresholds")
+    parser.add_argument("--smoothing", type=float, default=SMOOTHING, help="EWMA weight of the newest sample")
+    parser.add_argument("--hysteresis", type=float, default=HYSTERESIS,
+                        help="relative margin an edge must clear to stop being congested")
+    parser.add_argument("--predict", action="store_true", help="run the LSTM congestion model alongside the loop")
+    parser.add_argument("--model", default="lstm_traffic_AImodel.h5", help=".h5 or exported .tflite model")
+    parser.add_argument("--predict-every", type=int, default=10, help="steps between inference passes")
+    parser.add_argument("--inference-budget-ms", type=float, default=250.0, help="wall-time limit of one pass")
+    parser.add_argument("--profile", help="write stage histograms and counters here at the end (.json or .csv)")
+    parser.add_argument("--prometheus-port", type=int, help="serve /metrics on localhost during the run")
+    parser.add_argument("--cprofile", type=int, nargs=2, metavar=("FIRST", "COUNT"),
+                        help="cProfile steps FIRST..FIRST+COUNT-1 into --cprofile-out")
+    parser.add_argument("--cprofile-out", default="cprofile.prof")
+    parser.add_argument("--reroute-budget", type=int, default=REROUTE_BUDGET,
+                        help="vehicles rerouted per step at most, longest waiting first (0: no limit)")
+    parser.add_argument("--alternatives", type=int, default=ALTERNATIVES,
+                        help="alternative paths rerouted vehicles are spread over")
+    parser.add_argument("--record", metavar="DIR", help="record every frame for replay.py / interface.py --replay")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    thresholds = load_thresholds(args.thresholds) if args.thresholds else None
+    engine = TrafficEngine(args.net, args.config, gui=args.gui,
+                           sumo_args=SUMO_QUIET_ARGS,
+                           thresholds=thresholds, smoothing=args.smoothing, hysteresis=args.hysteresis,
+                           reroute_budget=args.reroute_budget, alternatives=args.alternatives)
+    if args.predict:
+        from prediction import PredictionService
+        engine.predictor = PredictionService(engine.net, args.model, args.predict_every, args.inference_budget_ms)
+    if args.cprofile:
+        engine.profiler.profile_window(*args.cprofile, args.cprofile_out)
+    if args.record:
+        from replay import Recorder
+        engine.recorder = Recorder(args.record, engine.edges, args.net)
+    server = engine.profiler.serve(args.prometheus_port) if args.prometheus_port else None
+    engine.start()
+    try:
+        steps = engine.run(args.steps, args.metrics)
+    finally:
+        engine.close()
+        if engine.predictor is not None:
+            engine.predictor.stop()
+        if server is not None:
+            server.shutdown()
+        if engine.recorder is not None:
+            engine.recorder.close()
+    print(f"{steps} steps in {time.perf_counter() - started:.1f} s, "
+          f"{engine.rerouted_total} vehicles rerouted, {engine.congestion.transitions} congestion transitions, "
+          f"metrics in {args.metrics}")
+    step = engine.profiler.stage("step").histogram
+    print(f"step p99 {step.quantile(0.99) * 1000:.1f} ms (max {step.max * 1000:.1f} ms), "
+          f"{engine.scheduler.deferred_total} reroute deferrals under a budget of {args.reroute_budget or 'none'}")
+    if engine.predictor is not None:
+        print(f"prediction: {engine.predictor.stats()}")
+    print(engine.profiler.summary())
+    if engine.recorder is not None:
+        recorder = engine.recorder
+        print(f"recorded {recorder.count} steps in {args.record}: {recorder.offset / 2**20:.2f} MiB "
+              f"({recorder.raw_bytes / max(recorder.offset, 1):.1f}x compressed)")
+    if args.profile:
+        engine.profiler.write(args.profile)
+        print(f"profile in {args.profile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,227 @@
-import traci
-import xml.etree.ElementTree as ET
-import math
-
-# Start SUMO silently
-sumoCmd = ["sumo", "-c", "osm.sumocfg", "--start", "--quit-on-end"]
-traci.start(sumoCmd)
-
-def distance(p1, p2):
-    return math.sqrt((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)
-
-# Get all candidate intersections
-intersections = {}
-edge_coverage = {}
-
-for junction_id in traci.junction.getIDList():
-    x, y = traci.junction.getPosition(junction_id)
-    edges = set(traci.junction.getIncomingEdges(junction_id) + traci.junction.getOutgoingEdges(junction_id))
-    if len(edges) > 2:
-        intersections[junction_id] = {"position": (x, y), "edges": edges}
-        edge_coverage[junction_id] = edges
-
-# Build complete edge set
-all_edges = set()
-for edges in edge_coverage.values():
-    all_edges.update(edges)
-
-covered_edges = set()
-used_positions = []
-selected_intersections = set()
-
-MIN_RSU_DISTANCE = 100  # Increase to reduce clustering
-print("Placing optimized RSUs...")
-
-# Greedy placement: place RSU only if it covers significant *new* edges
-while covered_edges != all_edges:
-    best_junction = None
-    best_new_coverage = 0
-
-    for junction_id, edges in edge_coverage.items():
-        if junction_id in selected_intersections:
-            continue
-
-        # Skip junctions near already-used ones
-        too_close = any(distance(intersections[junction_id]["position"], pos) < MIN_RSU_DISTANCE for pos in used_positions)
-        if too_close:
-            continue
-
-        new_coverage = len(edges - covered_edges)
-        if new_coverage > best_new_coverage:
-            best_new_coverage = new_coverage
-            best_junction = junction_id
-
-    if best_junction is None:
-        break
-
-    selected_intersections.add(best_junction)
-    covered_edges.update(edge_coverage[best_junction])
-    used_positions.append(intersections[best_junction]["position"])
-
-print(f"✅ Reduced RSUs to {len(selected_intersections)}")
-
-# Write RSUs to XML
-root = ET.Element("additional")
-rsu_count = 0
-
-for junction_id in selected_intersections:
-    x, y = intersections[junction_id]["position"]
-    edges = intersections[junction_id]["edges"]
-
-    selected_lane = None
-    min_distance = float("inf")
-    selected_pos = 0
-
-    for edge_id in edges:
-        lane_id = f"{edge_id}_0"
-        if lane_id in traci.lane.getIDList():
-            lane_length = traci.lane.getLength(lane_id)
-            if lane_length > 5:
-                lane_x, lane_y = traci.lane.getShape(lane_id)[0]
-                dist = ((x - lane_x)**2 + (y - lane_y)**2) ** 0.5
-                valid_pos = max(1, min(dist, lane_length - 1))
-                if valid_pos < min_distance:
-                    min_distance = valid_pos
-                    selected_lane = lane_id
-                    selected_pos = valid_pos
-
-    if selected_lane:
-        rsu_id = f"rsu_{rsu_count}"
-        ET.SubElement(root, "inductionLoop",
-                      id=rsu_id,
-                      lane=selected_lane,
-                      pos=str(selected_pos),
-                      freq="1",
-                      file="detector_output.xml")
-        rsu_count += 1
-
-tree = ET.ElementTree(root)
-tree.write("osm.add.xml")
-
-print(f"✅ Final RSU XML created with {rsu_count} RSUs")
-
-traci.close()
+"""Offline RSU placement: pick junctions for roadside units and write osm.add.xml.
+
+Everything comes from the network file (through netcache), so no SUMO
+instance is needed:
+
+    python generate_rsu.py [--net osm.net.xml.gz] [--min-distance 100] [--radius 150]
+
+Placement is greedy maximum coverage: the next RSU goes to the junction
+that covers the most edges not covered yet, at least --min-distance from
+every placed RSU.  Gains only shrink as edges get covered, so candidates
+sit in a heap keyed by their last known gain and only the top one is
+re-evaluated (lazy greedy).  Distance checks go through a uniform grid.
+
+Coverage models:
+    default      the edges touching the junction (junctions with more than
+                 two edges are candidates)
+    --radius R   every edge whose midpoint lies within R metres
+"""
+import argparse
+import heapq
+import math
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+
+import numpy as np
+
+from netcache import load_network
+
+MIN_RSU_DISTANCE = 100  # Increase to reduce clustering
+MIN_LANE_LENGTH = 5
+
+
+class GridIndex:
+    """Uniform grid of points for fixed-radius neighbour queries."""
+
+    def __init__(self, cell_size):
+        self.cell_size = max(cell_size, 1e-9)
+        self.cells = defaultdict(list)
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def add(self, item, x, y):
+        self.cells[self._cell(x, y)].append((item, x, y))
+
+    def near(self, x, y, radius):
+        """Items strictly closer than radius to (x, y)."""
+        reach = int(math.ceil(radius / self.cell_size))
+        cx, cy = self._cell(x, y)
+        limit = radius * radius
+        found = []
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                for item, px, py in self.cells.get((gx, gy), ()):
+                    if (px - x) ** 2 + (py - y) ** 2 < limit:
+                        found.append(item)
+        return found
+
+
+def pairs_within(a_xy, b_xy, radius):
+    """Index arrays (i, j) of all pairs a_xy[i], b_xy[j] closer than radius.
+
+    Both point sets are bucketed into radius-sized grid cells, so only the
+    3x3 cells around each point of a are compared.
+    """
+    cell = max(radius, 1e-9)
+    a_cell = np.floor(a_xy / cell).astype(np.int64)
+    b_cell = np.floor(b_xy / cell).astype(np.int64)
+    low = np.minimum(a_cell.min(axis=0), b_cell.min(axis=0)) - 1
+    height = max(a_cell[:, 1].max(), b_cell[:, 1].max()) - low[1] + 2
+    b_key = (b_cell[:, 0] - low[0]) * height + (b_cell[:, 1] - low[1])
+    order = np.argsort(b_key, kind="stable")
+    sorted_keys = b_key[order]
+
+    found_a, found_b = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            key = (a_cell[:, 0] + dx - low[0]) * height + (a_cell[:, 1] + dy - low[1])
+            first = np.searchsorted(sorted_keys, key, "left")
+            counts = np.searchsorted(sorted_keys, key, "right") - first
+            ia = np.repeat(np.arange(len(a_xy)), counts)
+            within = np.arange(len(ia)) - np.repeat(np.cumsum(counts) - counts, counts)
+            ib = order[np.repeat(first, counts) + within]
+            close = ((a_xy[ia] - b_xy[ib]) ** 2).sum(axis=1) < radius * radius
+            found_a.append(ia[close])
+            found_b.append(ib[close])
+    return np.concatenate(found_a), np.concatenate(found_b)
+
+
+def _junction_edges(net):
+    """(node, edge) index pairs for every edge end, sorted by node then edge, without duplicates."""
+    size = max(len(net.edge_ids), 1)
+    keys = np.sort(np.concatenate((net.edge_from.astype(np.int64) * size + np.arange(len(net.edge_ids)),
+                                   net.edge_to.astype(np.int64) * size + np.arange(len(net.edge_ids)))))
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+    return keys // size, keys % size
+
+
+def _group(keys, values, size):
+    """Sets of values per key in range(size); keys must be sorted."""
+    bounds = np.searchsorted(keys, np.arange(size + 1))
+    values = values.tolist()
+    return [set(values[a:b]) for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+
+
+def incident_edges(net):
+    """Edge indices touching each node, as a list of sets."""
+    nodes, edges = _junction_edges(net)
+    return _group(nodes, edges, len(net.node_ids))
+
+
+def junction_coverage(net, radius=None):
+    """{candidate node index: set of covered edge indices} for the chosen coverage model."""
+    incident = incident_edges(net)
+    candidates = [j for j, edges in enumerate(incident) if len(edges) > 2]
+    if radius is None or not candidates:
+        return {j: incident[j] for j in candidates}
+    midpoints = (net.node_xy[net.edge_from] + net.node_xy[net.edge_to]) / 2
+    near, edges = pairs_within(net.node_xy[candidates], midpoints, radius)
+    order = np.argsort(near, kind="stable")
+    nearby = _group(near[order], edges[order], len(candidates))
+    return {j: nearby[i] | incident[j] for i, j in enumerate(candidates)}
+
+
+def place_rsus(net, min_distance=MIN_RSU_DISTANCE, radius=None, max_rsus=None):
+    """Junction indices chosen for RSUs, in placement order.
+
+    Ties go to the junction listed first in the network, like a full rescan would.
+    """
+    coverage = junction_coverage(net, radius)
+    node_xy = net.node_xy.tolist()
+    # Placing an RSU blocks every candidate closer than min_distance, for good.
+    candidates = GridIndex(min_distance)
+    for j in coverage:
+        candidates.add(j, *node_xy[j])
+    blocked = bytearray(len(node_xy))
+    covered = set()
+    selected = []
+    heap = [(-len(edges), j) for j, edges in coverage.items()]
+    heapq.heapify(heap)
+    while heap and (max_rsus is None or len(selected) < max_rsus):
+        _, j = heapq.heappop(heap)
+        if blocked[j]:
+            continue
+        gain = len(coverage[j] - covered)
+        if gain == 0:
+            continue
+        if heap and (-gain, j) > heap[0]:
+            heapq.heappush(heap, (-gain, j))
+            continue
+        selected.append(j)
+        covered |= coverage[j]
+        blocked[j] = 1
+        for k in candidates.near(*node_xy[j], min_distance):
+            blocked[k] = 1
+    return selected
+
+
+def rsu_lanes(net, junctions):
+    """[(junction index, lane id, pos)]: the first lane of an incident edge closest to each junction.
+
+    pos is the distance from the junction to the lane start, kept 1 m inside
+    the lane; ties go to the lower edge index.
+    """
+    first_lane = np.full(len(net.edge_ids), -1, dtype=np.int64)
+    normal = np.flatnonzero(net.lane_edge >= 0)
+    edges, first = np.unique(net.lane_edge[normal], return_index=True)
+    first_lane[edges] = normal[first]
+
+    rank = np.full(len(net.node_ids), -1, dtype=np.int64)
+    rank[np.asarray(junctions, dtype=np.int64)] = np.arange(len(junctions))
+    nodes, edges = _junction_edges(net)
+    keep = rank[nodes] >= 0
+    nodes, edges = nodes[keep], edges[keep]
+    lanes = first_lane[edges]
+    keep = lanes >= 0
+    keep[keep] = net.lane_length[lanes[keep]] > MIN_LANE_LENGTH
+    nodes, edges, lanes = nodes[keep], edges[keep], lanes[keep]
+
+    length = net.lane_length[lanes]
+    dist = np.hypot(*(net.node_xy[nodes] - net.lane_xy[lanes]).T)
+    pos = np.maximum(1.0, np.minimum(dist, length - 1))
+    order = np.lexsort((edges, pos, rank[nodes]))
+    ranks = rank[nodes][order]
+    best = order[np.r_[True, ranks[1:] != ranks[:-1]]] if len(order) else order
+    return [(j, str(lane_id), p) for j, lane_id, p in
+            zip(nodes[best].tolist(), net.lane_ids[lanes[best]].tolist(), pos[best].tolist())]
+
+
+def write_additional(placements, out_path="osm.add.xml", detector_file="detector_output.xml", freq=1):
+    root = ET.Element("additional")
+    for rsu_count, (_, lane_id, pos) in enumerate(placements):
+        ET.SubElement(root, "inductionLoop",
+                      id=f"rsu_{rsu_count}",
+                      lane=lane_id,
+                      pos=str(pos),
+                      freq=f"{freq:g}",
+                      file=detector_file)
+    ET.ElementTree(root).write(out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Place RSUs on the network and write them as induction loops.")
+    parser.add_argument("-n", "--net", default="osm.net.xml.gz")
+    parser.add_argument("-o", "--out", default="osm.add.xml")
+    parser.add_argument("--min-distance", type=float, default=MIN_RSU_DISTANCE,
+                        help="minimum distance between two RSUs (m)")
+    parser.add_argument("--radius", type=float, default=None,
+                        help="cover edges within this distance instead of only the junction's own edges (m)")
+    parser.add_argument("--max-rsus", type=int, default=None)
+    parser.add_argument("--detector-file", default="detector_output.xml")
+    parser.add_argument("--freq", type=float, default=1, help="detector aggregation period (s)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    net = load_network(args.net)
+    print("Placing optimized RSUs...")
+    junctions = place_rsus(net, args.min_distance, args.radius, args.max_rsus)
+    print(f"✅ Reduced RSUs to {len(junctions)}")
+    placements = rsu_lanes(net, junctions)
+    write_additional(placements, args.out, args.detector_file, args.freq)
+    print(f"✅ Final RSU XML created with {len(placements)} RSUs in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,334 +1,472 @@
-# [Same imports and global variables — unchanged]
-import tkinter as tk
-from tkinter import ttk, messagebox
-import traci
-import threading
-from tensorflow.keras.models import load_model
-import sumolib
-import xml.etree.ElementTree as ET
-import networkx as nx
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-# Global variables
-vehicles_data = {}
-congested_edges = set()
-rerouted_vehicles = {}
-rerouted_vehicle_ids = set()
-edges = []
-graph = nx.DiGraph()
-vehicle_routes = {}
-selected_destination = None
-congestion_history = []
-rerouted_history = []
-latest_rerouted_vehicle = None
-
-# SUMO Network Parsing
-net = sumolib.net.readNet("osm.net.xml")
-canvas_width = 900
-canvas_height = 600
-min_x, min_y, max_x, max_y = net.getBoundary()
-
-
-# --- AI Model Integration Placeholder ---
-# This code integrates an AI model for congestion prediction (not used in current logic)
-
-def load_ai_model():
-   
-    try:
-        model = load_model("lstm_traffic_model.h5")
-        print("AI model loaded successfully (integration placeholder).")
-    except Exception as e:
-        print(f"AI model not found or failed to load (this does not affect simulation): {e}")
-
-
-def scale(x, y):
-    sx = (x - min_x) / (max_x - min_x) * canvas_width
-    sy = canvas_height - (y - min_y) / (max_y - min_y) * canvas_height
-    return sx, sy
-
-def parse_netxml(filename="osm.net.xml"):
-    global edges, graph, selected_destination
-    tree = ET.parse(filename)
-    root = tree.getroot()
-    edges = [e.get("id") for e in root.findall(".//edge") if e.get("id") and not e.get("function")]
-    if edges:
-        selected_destination = edges[-1]
-    for edge in net.getEdges():
-        if edge.getFromNode() and edge.getToNode():
-            graph.add_edge(edge.getFromNode().getID(), edge.getToNode().getID(), weight=edge.getLength())
-
-def parse_route_files():
-    global vehicle_routes
-    route_files = [
-        "osm.bicycle.trips.xml", "osm.bus.trips.xml", "osm.motorcycle.trips.xml",
-        "osm.passenger.trips.xml", "osm.pedestrian.rou.xml", "osm.truck.trips.xml"
-    ]
-    for route_file in route_files:
-        tree = ET.parse(route_file)
-        root = tree.getroot()
-        for trip in root.findall(".//trip"):
-            veh_id = trip.get("id")
-            from_edge = trip.get("from")
-            to_edge = trip.get("to")
-            vehicle_routes[veh_id] = (from_edge, to_edge)
-
-def start_sumo():
-    sumo_cmd = ["sumo-gui", "-c", "osm.sumocfg", "--start"]
-    traci.start(sumo_cmd)
-    monitor_traffic()
-
-def stop_sumo():
-    try:
-        traci.close()
-        messagebox.showinfo("SUMO Stopped", "SUMO simulation has been stopped.")
-    except traci.exceptions.FatalTraCIError:
-        messagebox.showerror("Error", "SUMO is not running.")
-
-def monitor_traffic():
-    try:
-        traci.simulationStep()
-        detect_congestion()
-        update_vehicle_data()
-        update_ui()
-        update_combined_graph()
-        update_rerouting_pie_chart()
-        root.after(500, monitor_traffic)
-    except traci.exceptions.FatalTraCIError:
-        messagebox.showerror("Error", "TraCI not connected! Restart SUMO.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Simulation error: {e}")
-
-def detect_congestion():
-    global congested_edges
-    congested_edges.clear()
-    for edge in edges:
-        count = traci.edge.getLastStepVehicleNumber(edge)
-        speed = traci.edge.getLastStepMeanSpeed(edge)
-        wait = sum(traci.vehicle.getWaitingTime(v) for v in traci.edge.getLastStepVehicleIDs(edge)) / max(count, 1)
-        if (count > 5 and speed < 5.0) or wait > 10:
-            congested_edges.add(edge)
-
-def update_vehicle_data():
-    global vehicles_data
-    new_data = {}
-    for vehicle_id in traci.vehicle.getIDList():
-        speed = traci.vehicle.getSpeed(vehicle_id)
-        edge = traci.vehicle.getRoadID(vehicle_id)
-        new_data[vehicle_id] = (speed, edge)
-        if edge in congested_edges:
-            reroute_vehicle(vehicle_id)
-    vehicles_data.clear()
-    vehicles_data.update(new_data)
-
-def find_shortest_path(source_edge, dest_edge):
-    try:
-        if source_edge not in edges or dest_edge not in edges:
-            return None
-        source_node = net.getEdge(source_edge).getFromNode().getID()
-        dest_node = net.getEdge(dest_edge).getFromNode().getID()
-        if source_node in graph and dest_node in graph:
-            node_path = nx.shortest_path(graph, source=source_node, target=dest_node, weight="weight")
-            edge_path = []
-            for i in range(len(node_path) - 1):
-                for edge in net.getEdges():
-                    if edge.getFromNode().getID() == node_path[i] and edge.getToNode().getID() == node_path[i + 1]:
-                        edge_path.append(edge.getID())
-            if source_edge not in edge_path:
-                edge_path.insert(0, source_edge)
-            return edge_path
-    except Exception:
-        return None
-
-def reroute_vehicle(vehicle_id):
-    global latest_rerouted_vehicle
-    current_edge = traci.vehicle.getRoadID(vehicle_id)
-    if vehicle_id in rerouted_vehicles:
-        return
-    if current_edge in congested_edges and selected_destination:
-        new_path = find_shortest_path(current_edge, selected_destination)
-        if new_path:
-            traci.vehicle.changeTarget(vehicle_id, new_path[-1])
-            old_route = traci.vehicle.getRoute(vehicle_id)
-            rerouted_vehicles[vehicle_id] = {"old": old_route, "new": new_path}
-            rerouted_vehicle_ids.add(vehicle_id)
-            latest_rerouted_vehicle = vehicle_id
-
-def update_ui():
-    update_vehicle_table()
-    update_congestion_table()
-    update_rerouted_table()
-
-def update_vehicle_table():
-    vehicle_table.delete(*vehicle_table.get_children())
-    for vehicle_id, (speed, edge) in vehicles_data.copy().items():
-        vehicle_table.insert("", "end", values=(vehicle_id, edge, f"{speed:.2f} m/s"))
-
-def update_congestion_table():
-    congestion_table.delete(*congestion_table.get_children())
-    for edge in congested_edges:
-        congestion_table.insert("", "end", values=(edge, "⚠️ Congested"))
-
-def update_rerouted_table():
-    rerouted_table.delete(*rerouted_table.get_children())
-    for vehicle_id, paths in rerouted_vehicles.items():
-        old_route = " → ".join(paths["old"])
-        new_route = " → ".join(paths["new"])
-        rerouted_table.insert("", "end", values=(vehicle_id, old_route, new_route))
-
-def open_combined_graph():
-    global graph_window, fig, ax, canvas
-    graph_window = tk.Toplevel(root)
-    graph_window.title("Congestion and Rerouted Vehicles Over Time")
-    graph_window.geometry("900x500")
-    fig, ax = plt.subplots(figsize=(8.5, 4))
-    canvas = FigureCanvasTkAgg(fig, master=graph_window)
-    canvas.get_tk_widget().pack()
-    ax.set_title("Network Stats Over Time")
-    ax.set_xlabel("Timestep")
-    ax.set_ylabel("Count")
-    ax.grid(True)
-    ax.legend(["Congested Edges", "Rerouted Vehicles"])
-
-def update_combined_graph():
-    if 'ax' in globals():
-        congestion_history.append(len(congested_edges))
-        rerouted_history.append(len(rerouted_vehicle_ids))  # cumulative count
-        ax.clear()
-        ax.plot(congestion_history, color='red', label="Congested Edges", linewidth=2)
-        ax.plot(rerouted_history, color='blue', label="Rerouted Vehicles", linewidth=2)
-        ax.set_title("Network Stats Over Time")
-        ax.set_xlabel("Timestep")
-        ax.set_ylabel("Count")
-        ax.legend()
-        ax.grid(True)
-        canvas.draw()
-
-def open_rerouting_pie_chart_window():
-    global pie_window, pie_fig, pie_ax, pie_canvas
-    pie_window = tk.Toplevel(root)
-    pie_window.title("Rerouting Statistics")
-    pie_window.geometry("500x400")
-    pie_fig, pie_ax = plt.subplots(figsize=(5, 4))
-    pie_canvas = FigureCanvasTkAgg(pie_fig, master=pie_window)
-    pie_canvas.get_tk_widget().pack()
-
-def update_rerouting_pie_chart():
-    if 'pie_ax' in globals():
-        total = len(vehicles_data)
-        rerouted = len(rerouted_vehicles)
-        non_rerouted = max(total - rerouted, 0)
-        pie_ax.clear()
-        pie_ax.pie([rerouted, non_rerouted], labels=["Rerouted", "Not Rerouted"],
-                   colors=["#FF6347", "#90EE90"], autopct="%1.1f%%", startangle=90)
-        pie_ax.set_title("Rerouting Distribution")
-        pie_canvas.draw()
-
-def open_network_canvas():
-    global network_window, network_canvas
-    network_window = tk.Toplevel(root)
-    network_window.title("SUMO Network Visualization")
-    network_window.geometry(f"{canvas_width}x{canvas_height}")
-    network_canvas = tk.Canvas(network_window, bg="white", width=canvas_width, height=canvas_height)
-    network_canvas.pack(fill="both", expand=True)
-    real_time_network_canvas_update()
-
-def real_time_network_canvas_update():
-    if network_canvas:
-        network_canvas.delete("all")
-        for edge in net.getEdges():
-            shape = edge.getShape()
-            if len(shape) >= 2:
-                edge_id = edge.getID()
-                try:
-                    speed = traci.edge.getLastStepMeanSpeed(edge_id)
-                    count = traci.edge.getLastStepVehicleNumber(edge_id)
-                    wait = sum(traci.vehicle.getWaitingTime(v) for v in traci.edge.getLastStepVehicleIDs(edge_id)) / max(count, 1)
-                    color = "gray"
-                    if (count > 5 and speed < 5) or wait > 10:
-                        color = "red"
-                    elif count > 2:
-                        color = "yellow"
-                    else:
-                        color = "green"
-                except:
-                    color = "gray"
-                for i in range(len(shape) - 1):
-                    x1, y1 = scale(*shape[i])
-                    x2, y2 = scale(*shape[i + 1])
-                    network_canvas.create_line(x1, y1, x2, y2, fill=color, width=2)
-
-        if latest_rerouted_vehicle and latest_rerouted_vehicle in rerouted_vehicles:
-            paths = rerouted_vehicles[latest_rerouted_vehicle]
-            for route_type, clr in [("old", "black"), ("new", "blue")]:
-                for edge_id in paths[route_type]:
-                    try:
-                        edge = net.getEdge(edge_id)
-                        shape = edge.getShape()
-                        for i in range(len(shape) - 1):
-                            x1, y1 = scale(*shape[i])
-                            x2, y2 = scale(*shape[i + 1])
-                            network_canvas.create_line(x1, y1, x2, y2, fill=clr, width=3)
-                    except:
-                        continue
-            try:
-                x, y = traci.vehicle.getPosition(latest_rerouted_vehicle)
-                sx, sy = scale(x, y)
-                network_canvas.create_oval(sx - 5, sy - 5, sx + 5, sy + 5, fill="orange")
-                network_canvas.create_text(sx + 10, sy, text=latest_rerouted_vehicle, anchor="w",
-                                           font=("Helvetica", 10, "bold"), fill="darkblue")
-            except:
-                pass
-        network_canvas.after(1000, real_time_network_canvas_update)
-
-# ------------ MAIN UI ----------------
-parse_netxml()
-parse_route_files()
-
-root = tk.Tk()
-root.title("Traffic Congestion & V2I Interface")
-root.geometry("1100x900")
-root.configure(bg="#f0f0f5")
-
-style = ttk.Style()
-style.configure("Treeview.Heading", font=("Helvetica", 11, "bold"))
-style.configure("Treeview", font=("Helvetica", 10))
-
-tk.Label(root, text="V2I-based Real-Time Traffic Monitoring", font=("Helvetica", 18, "bold"),
-         bg="#f0f0f5", fg="#003366").pack(pady=20)
-
-btn_frame = tk.Frame(root, bg="#f0f0f5")
-btn_frame.pack(pady=10)
-
-tk.Button(btn_frame, text="▶ Start Simulation", command=start_sumo, bg="#28a745", fg="white",
-          font=("Helvetica", 11, "bold")).grid(row=0, column=0, padx=10)
-tk.Button(btn_frame, text="■ Stop Simulation", command=stop_sumo, bg="#dc3545", fg="white",
-          font=("Helvetica", 11, "bold")).grid(row=0, column=1, padx=10)
-tk.Button(btn_frame, text="📊 Show Graphs", command=open_combined_graph, bg="#6f42c1", fg="white",
-          font=("Helvetica", 11, "bold")).grid(row=0, column=2, padx=10)
-tk.Button(btn_frame, text="🌐 Open Network", command=open_network_canvas, bg="#007bff", fg="white",
-          font=("Helvetica", 11, "bold")).grid(row=0, column=3, padx=10)
-tk.Button(btn_frame, text="📈 Show Rerouting Stats", command=open_rerouting_pie_chart_window, bg="#ff8800",
-          fg="white", font=("Helvetica", 11, "bold")).grid(row=0, column=4, padx=10)
-
-tk.Label(root, text="Live Vehicle Data", font=("Helvetica", 14, "bold"), bg="#f0f0f5").pack(pady=(20, 5))
-vehicle_table = ttk.Treeview(root, columns=("Vehicle ID", "Current Edge", "Speed"), show="headings", height=5)
-vehicle_table.heading("Vehicle ID", text="Vehicle ID")
-vehicle_table.heading("Current Edge", text="Current Edge")
-vehicle_table.heading("Speed", text="Speed (m/s)")
-vehicle_table.pack(fill="both", padx=20)
-
-tk.Label(root, text="Congested Edges", font=("Helvetica", 14, "bold"), bg="#f0f0f5").pack(pady=(20, 5))
-congestion_table = ttk.Treeview(root, columns=("Edge", "Status"), show="headings", height=4)
-congestion_table.heading("Edge", text="Edge")
-congestion_table.heading("Status", text="Status")
-congestion_table.pack(fill="both", padx=20)
-
-tk.Label(root, text="Rerouted Vehicles", font=("Helvetica", 14, "bold"), bg="#f0f0f5").pack(pady=(20, 5))
-rerouted_table = ttk.Treeview(root, columns=("Vehicle ID", "Old Route", "New Route"), show="headings", height=5)
-rerouted_table.heading("Vehicle ID", text="Vehicle ID")
-rerouted_table.heading("Old Route", text="Old Route")
-rerouted_table.heading("New Route", text="New Route")
-rerouted_table.pack(fill="both", padx=20)
-
-root.mainloop()
\ No newline at end of file
+# GUI on top of engine.py; matplotlib and TensorFlow are imported only when needed
+#   python interface.py [--record DIR]   live SUMO run (optionally recorded)
+#   python interface.py --replay DIR     play a recording back without SUMO
+import argparse
+import os
+import tkinter as tk
+from tkinter import ttk, messagebox
+import traci
+import queue
+import math
+import time
+import numpy as np
+from congestion import CLASS_COLORS, UNKNOWN
+from engine import SimulationWorker, TrafficEngine
+from netcache import load_network
+from profiling import Profiler
+from replay import Recorder, Recording, ReplayWorker
+from tables import KeyedTable
+from timeseries import TimeSeries
+
+# Global variables
+engine = None  # live runs only
+worker = None
+recording = None  # replay.Recording when playing one back instead of running SUMO
+net = None  # network drawn on the canvas; None when a recording's network is not available
+profiler = None  # the engine's in live runs, so SUMO and GUI stages end up in one profile
+# step -> (congested edges, rerouted vehicles), constant memory however long the run
+stats_series = TimeSeries(2)
+pie_values = None
+
+# UI-side view of the simulation, only touched on the Tk thread
+UI_FRAME_MS = 250
+current_frame = None
+shown_reroutes = {}  # rerouted vehicles still in the simulation
+shown_reroute_total = 0
+shown_latest_vehicle = None
+ui_frame_times = []
+network_canvas = None
+edge_items = []      # canvas item per edge index (None for edges without a shape)
+edge_classes = None  # congestion class currently drawn per edge
+
+canvas_width = 900
+canvas_height = 600
+
+
+# --- AI Model Integration ---
+# LSTM congestion prediction (prediction.py); predicted edges get a higher routing weight
+
+def load_ai_model(net):
+    # The model itself is loaded in the service thread once SUMO starts; a
+    # missing model or TensorFlow does not affect the simulation.
+    try:
+        from prediction import PredictionService
+        return PredictionService(net)
+    except Exception as e:
+        print(f"AI model not found or failed to load (this does not affect simulation): {e}")
+        return None
+
+
+def scale(x, y):
+    min_x, min_y, max_x, max_y = net.getBoundary()
+    sx = (x - min_x) / (max_x - min_x) * canvas_width
+    sy = canvas_height - (y - min_y) / (max_y - min_y) * canvas_height
+    return sx, sy
+
+def start_sumo():
+    global worker
+    if worker and worker.is_alive():
+        return
+    if recording is not None:
+        worker = ReplayWorker(recording, REPLAY_SPEEDS[replay_speed.get()])
+        reset_view(0)
+    else:
+        engine.start()
+        reset_view()
+        worker = SimulationWorker(engine)
+    worker.start()
+    root.after(UI_FRAME_MS, render_frame)
+
+def stop_sumo():
+    if worker:
+        worker.stop_event.set()
+        worker.join()
+    if recording is not None:
+        messagebox.showinfo("Replay Stopped", "Replay has been stopped.")
+        return
+    if engine.conn is None:
+        messagebox.showerror("Error", "SUMO is not running.")
+        return
+    try:
+        engine.close()
+        messagebox.showinfo("SUMO Stopped", "SUMO simulation has been stopped.")
+    except traci.exceptions.FatalTraCIError:
+        messagebox.showerror("Error", "SUMO is not running.")
+
+# --- Replay controls ---
+REPLAY_SPEEDS = {"0.5x": 0.5, "1x": 1.0, "2x": 2.0, "5x": 5.0, "10x": 10.0, "Max": 0.0}
+
+def reset_view(position=0):
+    """Start the UI-side state over at a recording position (e.g. after a seek) or for a new live run."""
+    global stats_series, shown_reroute_total, current_frame, shown_latest_vehicle, pie_values
+    stats_series = TimeSeries(2)
+    shown_reroute_total = 0
+    if recording is not None:
+        index = recording.index[:position]
+        for step, congested, total in zip(index["step"].tolist(), index["congested"].tolist(),
+                                          index["rerouted_total"].tolist()):
+            stats_series.append(step, congested, total)
+        shown_reroute_total = int(index["rerouted_total"][-1]) if position else 0
+    # Reroute events before the seek target are not replayed; the table starts empty.
+    shown_reroutes.clear()
+    current_frame = shown_latest_vehicle = pie_values = None
+
+def seek_replay(event=None):
+    if recording is None or worker is None or not worker.is_alive():
+        return
+    position = int(replay_scale.get())
+    worker.seek(position)
+    reset_view(position)
+
+def toggle_replay_pause():
+    if worker is None or recording is None:
+        return
+    if worker.paused.is_set():
+        worker.paused.clear()
+        pause_button.config(text="⏸ Pause")
+    else:
+        worker.paused.set()
+        pause_button.config(text="▶ Resume")
+
+def set_replay_speed(choice):
+    if worker is not None and recording is not None:
+        worker.speed = REPLAY_SPEEDS[choice]
+
+def export_profile():
+    # Stage timings of the engine (SUMO, TraCI, detection, routing) and of this GUI
+    profiler.write_json("profile.json")
+    profiler.write_csv("profile.csv")
+    messagebox.showinfo("Profile Exported", "Stage timings written to profile.json and profile.csv.\n\n"
+                        + profiler.summary())
+
+
+def render_frame():
+    """Tk-side loop: take the newest frame, fold in reroutes of skipped ones, redraw."""
+    global current_frame, shown_latest_vehicle, shown_reroute_total
+    frame = None
+    while True:
+        try:
+            frame = worker.frames.get_nowait()
+        except queue.Empty:
+            break
+        for vehicle_id, old_route, new_route in frame.reroutes:
+            shown_reroutes[vehicle_id] = {"old": old_route, "new": new_route}
+        shown_reroute_total += len(frame.reroutes)
+        for vehicle_id in frame.arrived:
+            shown_reroutes.pop(vehicle_id, None)
+        stats_series.append(frame.snapshot.step, len(frame.congested), shown_reroute_total)
+    if frame is not None:
+        current_frame = frame
+        shown_latest_vehicle = frame.latest_rerouted
+        with profiler.stage("ui_update"):
+            update_ui()
+        with profiler.stage("chart_draw"):
+            update_combined_graph()
+            update_rerouting_pie_chart()
+        now = time.perf_counter()
+        ui_frame_times.append(now)
+        while ui_frame_times and now - ui_frame_times[0] > 1.0:
+            ui_frame_times.pop(0)
+        if recording is not None:
+            rate_text = (f"Replay: step {frame.snapshot.step} ({frame.snapshot.time:.0f} s) | "
+                         f"UI: {len(ui_frame_times)} fps")
+            replay_scale.set(worker.position - 1)
+        else:
+            rate_text = f"Simulation: {frame.step_rate:.1f} steps/s | UI: {len(ui_frame_times)} fps"
+        predictor = engine.predictor if engine is not None else None
+        if predictor is not None and predictor.runs:
+            rate_text += f" | LSTM: {predictor.last_ms:.0f} ms, {len(predictor.predicted)} edges predicted"
+        rate_label.config(text=rate_text)
+    if worker.error:
+        messagebox.showerror("Error", worker.error)
+    elif worker.is_alive() or not worker.frames.empty():
+        root.after(UI_FRAME_MS, render_frame)
+
+def update_ui():
+    update_vehicle_table()
+    update_congestion_table()
+    update_rerouted_table()
+
+def update_vehicle_table():
+    vehicle_view.set_rows(current_frame.snapshot.vehicles)
+
+def update_congestion_table():
+    congestion_view.set_rows(dict.fromkeys(sorted(current_frame.congested)))
+
+def update_rerouted_table():
+    rerouted_view.set_rows(shown_reroutes)
+
+def format_vehicle_row(vehicle_id, state):
+    return (vehicle_id, state.edge, f"{state.speed:.2f} m/s")
+
+def format_congestion_row(edge, _):
+    return (edge, "⚠️ Congested")
+
+def format_rerouted_row(vehicle_id, paths):
+    # Only called for rows on the visible page, once per reroute
+    return (vehicle_id, " → ".join(paths["old"]), " → ".join(paths["new"]))
+
+def open_combined_graph():
+    global graph_window, fig, ax, canvas, congestion_line, rerouted_line
+    graph_window = tk.Toplevel(root)
+    graph_window.title("Congestion and Rerouted Vehicles Over Time")
+    graph_window.geometry("900x500")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    fig, ax = plt.subplots(figsize=(8.5, 4))
+    canvas = FigureCanvasTkAgg(fig, master=graph_window)
+    canvas.get_tk_widget().pack()
+    ax.set_title("Network Stats Over Time")
+    ax.set_xlabel("Timestep")
+    ax.set_ylabel("Count")
+    ax.grid(True)
+    ax.set_xlim(0, 100)
+    ax.set_ylim(0, 10)
+    # Persistent, animated lines: drawn by blitting over a cached background
+    congestion_line, = ax.plot([], [], color='red', label="Congested Edges", linewidth=2, animated=True)
+    rerouted_line, = ax.plot([], [], color='blue', label="Rerouted Vehicles", linewidth=2, animated=True)
+    ax.legend()
+    canvas.mpl_connect("draw_event", capture_graph_background)
+    canvas.draw()
+
+def capture_graph_background(event=None):
+    global graph_background
+    graph_background = canvas.copy_from_bbox(ax.bbox)
+    ax.draw_artist(congestion_line)
+    ax.draw_artist(rerouted_line)
+
+def update_combined_graph():
+    if 'ax' in globals() and graph_window.winfo_exists():
+        x, values = stats_series.arrays()
+        if not len(x):
+            return
+        congestion_line.set_data(x, values[0])
+        rerouted_line.set_data(x, values[1])
+        x_min, x_max = ax.get_xlim()
+        y_max = ax.get_ylim()[1]
+        if x[-1] > x_max or values.max() > y_max or x[0] > x_min + (x_max - x_min) / 2:
+            # Out of view: grow the axes with headroom, then a full redraw refreshes the background.
+            ax.set_xlim(x[0], x[0] + max((x[-1] - x[0]) * 1.25, 100))
+            ax.set_ylim(0, max(values.max() * 1.25, 10))
+            canvas.draw()
+        else:
+            canvas.restore_region(graph_background)
+            ax.draw_artist(congestion_line)
+            ax.draw_artist(rerouted_line)
+            canvas.blit(ax.bbox)
+
+def open_rerouting_pie_chart_window():
+    global pie_window, pie_fig, pie_ax, pie_canvas, pie_wedges, pie_labels, pie_pcts, pie_values
+    pie_window = tk.Toplevel(root)
+    pie_window.title("Rerouting Statistics")
+    pie_window.geometry("500x400")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    pie_fig, pie_ax = plt.subplots(figsize=(5, 4))
+    pie_canvas = FigureCanvasTkAgg(pie_fig, master=pie_window)
+    pie_canvas.get_tk_widget().pack()
+    # Built once; updates only move the wedge angles and texts.
+    pie_wedges, pie_labels, pie_pcts = pie_ax.pie([1, 1], labels=["Rerouted", "Not Rerouted"],
+                                                  colors=["#FF6347", "#90EE90"], autopct="%1.1f%%", startangle=90)
+    pie_ax.set_title("Rerouting Distribution")
+    pie_values = None
+
+def update_rerouting_pie_chart():
+    global pie_values
+    if 'pie_ax' in globals() and pie_window.winfo_exists():
+        total = len(current_frame.snapshot.vehicles)
+        rerouted = len(shown_reroutes)
+        non_rerouted = max(total - rerouted, 0)
+        if (rerouted, non_rerouted) == pie_values:
+            return
+        pie_values = (rerouted, non_rerouted)
+        share = rerouted / max(rerouted + non_rerouted, 1)
+        bounds = [(90, 90 + 360 * share), (90 + 360 * share, 450)]
+        for wedge, label, pct, (theta1, theta2) in zip(pie_wedges, pie_labels, pie_pcts, bounds):
+            wedge.set_theta1(theta1)
+            wedge.set_theta2(theta2)
+            mid = math.radians((theta1 + theta2) / 2)
+            label.set_position((1.1 * math.cos(mid), 1.1 * math.sin(mid)))
+            label.set_horizontalalignment("left" if math.cos(mid) >= 0 else "right")
+            pct.set_position((0.6 * math.cos(mid), 0.6 * math.sin(mid)))
+            pct.set_text(f"{(theta2 - theta1) / 3.6:.1f}%")
+            label.set_visible(theta2 > theta1)
+            pct.set_visible(theta2 > theta1)
+        pie_canvas.draw_idle()
+
+def open_network_canvas():
+    global network_window, network_canvas, canvas_points, canvas_starts, overlay_vehicle, edge_classes
+    if net is None:
+        messagebox.showerror("Error", "The network of this recording is not available.")
+        return
+    canvas_points, canvas_starts = net.canvas_shapes(canvas_width, canvas_height)
+    network_window = tk.Toplevel(root)
+    network_window.title("SUMO Network Visualization")
+    network_window.geometry(f"{canvas_width}x{canvas_height}")
+    network_canvas = tk.Canvas(network_window, bg="white", width=canvas_width, height=canvas_height)
+    network_canvas.pack(fill="both", expand=True)
+    # Retained mode: one polyline per edge, created once and only recoloured afterwards.
+    edge_items.clear()
+    for index in range(len(net.edge_ids)):
+        coords = edge_canvas_coords(index)
+        edge_items.append(network_canvas.create_line(*coords, fill="gray", width=2, tags=("edge",))
+                          if len(coords) >= 4 else None)
+    edge_classes = np.full(len(net.edge_ids), UNKNOWN, dtype=np.int8)
+    overlay_vehicle = None
+    real_time_network_canvas_update()
+
+def edge_canvas_coords(index):
+    return canvas_points[canvas_starts[index]:canvas_starts[index + 1]].ravel().tolist()
+
+def real_time_network_canvas_update():
+    if not (network_canvas and network_canvas.winfo_exists()):
+        return
+    started = time.perf_counter()
+    with profiler.stage("canvas_draw"):
+        changed = draw_network_canvas()
+    elapsed = (time.perf_counter() - started) * 1000
+    network_window.title(f"SUMO Network Visualization - {changed} edges updated in {elapsed:.1f} ms")
+    network_canvas.after(1000, real_time_network_canvas_update)
+
+def draw_network_canvas():
+    """Recolour edges whose class changed and refresh the overlay; returns the number of edges recoloured."""
+    global overlay_vehicle
+    changed = 0
+    if current_frame is not None:
+        classes = current_frame.classes
+        for index in np.flatnonzero(classes != edge_classes).tolist():
+            if edge_items[index] is not None:
+                network_canvas.itemconfig(edge_items[index], fill=CLASS_COLORS[int(classes[index])])
+                changed += 1
+        edge_classes[:] = classes
+
+    # Rerouted-path overlay: its own layer, rebuilt only when the vehicle changes.
+    if shown_latest_vehicle != overlay_vehicle:
+        network_canvas.delete("overlay")
+        overlay_vehicle = shown_latest_vehicle
+        paths = shown_reroutes.get(overlay_vehicle)
+        if paths:
+            for route_type, clr in [("old", "black"), ("new", "blue")]:
+                for edge_id in paths[route_type]:
+                    index = net.edge_index.get(edge_id)
+                    if index is not None:
+                        network_canvas.create_line(*edge_canvas_coords(index), fill=clr, width=3,
+                                                   tags=("overlay",))
+            network_canvas.create_oval(0, 0, 0, 0, fill="orange", tags=("overlay", "marker"))
+            network_canvas.create_text(0, 0, text=overlay_vehicle, anchor="w", font=("Helvetica", 10, "bold"),
+                                       fill="darkblue", tags=("overlay", "label"))
+    state = current_frame.snapshot.vehicles.get(overlay_vehicle) if current_frame and overlay_vehicle else None
+    if state is not None:
+        sx, sy = scale(*state.position)
+        network_canvas.coords("marker", sx - 5, sy - 5, sx + 5, sy + 5)
+        network_canvas.coords("label", sx + 10, sy)
+        network_canvas.itemconfig("marker", state="normal")
+        network_canvas.itemconfig("label", state="normal")
+    else:
+        network_canvas.itemconfig("marker", state="hidden")
+        network_canvas.itemconfig("label", state="hidden")
+    network_canvas.tag_raise("overlay")
+    return changed
+
+# ------------ MAIN UI ----------------
+def main():
+    global engine, recording, net, profiler, root, rate_label, vehicle_table, congestion_table, rerouted_table
+    global vehicle_view, congestion_view, rerouted_view, replay_scale, replay_speed, pause_button
+    parser = argparse.ArgumentParser(description="V2I traffic monitoring GUI.")
+    parser.add_argument("--record", metavar="DIR", help="record the run for later replay")
+    parser.add_argument("--replay", metavar="DIR", help="play a recording back instead of running SUMO")
+    args = parser.parse_args()
+
+    if args.replay:
+        # Playback needs neither SUMO nor its configuration; the network only draws the map.
+        recording = Recording(args.replay)
+        profiler = Profiler()
+        net_file = recording.meta.get("net_file") or "osm.net.xml.gz"
+        if os.path.exists(net_file):
+            net = load_network(net_file)
+            if net.edge_ids.tolist() != recording.edge_ids:
+                raise SystemExit(f"{args.replay} was not recorded on {net_file}")
+        else:
+            print(f"{net_file} not found; replaying without the network view.")
+    else:
+        engine = TrafficEngine(gui=True)
+        engine.predictor = load_ai_model(engine.net)
+        if args.record:
+            engine.recorder = Recorder(args.record, engine.edges, "osm.net.xml.gz")
+        net, profiler = engine.net, engine.profiler
+
+    root = tk.Tk()
+    root.title("Traffic Congestion & V2I Interface")
+    root.geometry("1100x900")
+    root.configure(bg="#f0f0f5")
+
+    style = ttk.Style()
+    style.configure("Treeview.Heading", font=("Helvetica", 11, "bold"))
+    style.configure("Treeview", font=("Helvetica", 10))
+
+    tk.Label(root, text="V2I-based Real-Time Traffic Monitoring", font=("Helvetica", 18, "bold"),
+             bg="#f0f0f5", fg="#003366").pack(pady=20)
+
+    btn_frame = tk.Frame(root, bg="#f0f0f5")
+    btn_frame.pack(pady=10)
+
+    rate_label = tk.Label(root, text="Simulation: - steps/s | UI: - fps", font=("Helvetica", 10), bg="#f0f0f5")
+    rate_label.pack()
+
+    tk.Button(btn_frame, text="▶ Start Simulation", command=start_sumo, bg="#28a745", fg="white",
+              font=("Helvetica", 11, "bold")).grid(row=0, column=0, padx=10)
+    tk.Button(btn_frame, text="■ Stop Simulation", command=stop_sumo, bg="#dc3545", fg="white",
+              font=("Helvetica", 11, "bold")).grid(row=0, column=1, padx=10)
+    tk.Button(btn_frame, text="📊 Show Graphs", command=open_combined_graph, bg="#6f42c1", fg="white",
+              font=("Helvetica", 11, "bold")).grid(row=0, column=2, padx=10)
+    tk.Button(btn_frame, text="🌐 Open Network", command=open_network_canvas, bg="#007bff", fg="white",
+              font=("Helvetica", 11, "bold")).grid(row=0, column=3, padx=10)
+    tk.Button(btn_frame, text="📈 Show Rerouting Stats", command=open_rerouting_pie_chart_window, bg="#ff8800",
+              fg="white", font=("Helvetica", 11, "bold")).grid(row=0, column=4, padx=10)
+    tk.Button(btn_frame, text="⏱ Export Profile", command=export_profile, bg="#6c757d", fg="white",
+              font=("Helvetica", 11, "bold")).grid(row=0, column=5, padx=10)
+
+    if recording is not None:
+        replay_frame = tk.Frame(root, bg="#f0f0f5")
+        replay_frame.pack(fill="x", padx=20)
+        pause_button = tk.Button(replay_frame, text="⏸ Pause", command=toggle_replay_pause,
+                                 font=("Helvetica", 10, "bold"))
+        pause_button.pack(side="left")
+        replay_speed = tk.StringVar(value="1x")
+        tk.OptionMenu(replay_frame, replay_speed, *REPLAY_SPEEDS, command=set_replay_speed).pack(side="left", padx=5)
+        replay_scale = tk.Scale(replay_frame, from_=0, to=max(len(recording) - 1, 0), orient="horizontal",
+                                showvalue=False, bg="#f0f0f5", highlightthickness=0)
+        replay_scale.pack(side="left", fill="x", expand=True, padx=5)
+        # Seek on release only, so moving the slider from render_frame does not seek.
+        replay_scale.bind("<ButtonRelease-1>", seek_replay)
+
+    tk.Label(root, text="Live Vehicle Data", font=("Helvetica", 14, "bold"), bg="#f0f0f5").pack(pady=(20, 5))
+    vehicle_table = ttk.Treeview(root, columns=("Vehicle ID", "Current Edge", "Speed"), show="headings", height=5)
+    vehicle_table.heading("Vehicle ID", text="Vehicle ID")
+    vehicle_table.heading("Current Edge", text="Current Edge")
+    vehicle_table.heading("Speed", text="Speed (m/s)")
+    vehicle_table.pack(fill="both", padx=20)
+    vehicle_view = KeyedTable(vehicle_table, format_vehicle_row, pager_parent=root)
+
+    tk.Label(root, text="Congested Edges", font=("Helvetica", 14, "bold"), bg="#f0f0f5").pack(pady=(20, 5))
+    congestion_table = ttk.Treeview(root, columns=("Edge", "Status"), show="headings", height=4)
+    congestion_table.heading("Edge", text="Edge")
+    congestion_table.heading("Status", text="Status")
+    congestion_table.pack(fill="both", padx=20)
+    congestion_view = KeyedTable(congestion_table, format_congestion_row, pager_parent=root)
+
+    tk.Label(root, text="Rerouted Vehicles", font=("Helvetica", 14, "bold"), bg="#f0f0f5").pack(pady=(20, 5))
+    rerouted_table = ttk.Treeview(root, columns=("Vehicle ID", "Old Route", "New Route"), show="headings", height=5)
+    rerouted_table.heading("Vehicle ID", text="Vehicle ID")
+    rerouted_table.heading("Old Route", text="Old Route")
+    rerouted_table.heading("New Route", text="New Route")
+    rerouted_table.pack(fill="both", padx=20)
+    rerouted_view = KeyedTable(rerouted_table, format_rerouted_row, pager_parent=root)
+
+    root.mainloop()
+    if engine is not None and engine.recorder is not None:
+        engine.recorder.close()
+
+
+if __name__ == "__main__":
+    main()
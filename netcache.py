@@ -0,0 +1,194 @@
+"""Single-pass network loader with a persistent, memory-mapped cache.
+
+The SUMO net file (plain or .gz) is streamed once with iterparse and
+compiled into flat NumPy arrays: junctions, normal edges (routing
+adjacency), edge shapes normalised to the network boundary (ready to be
+scaled to a canvas) and the lane table.  The arrays are written as .npy
+files into ``<net file>.cache/`` together with the SHA-1 of the net file;
+later runs memory-map them and skip XML parsing entirely.
+
+    net = load_network("osm.net.xml.gz")
+"""
+import gzip
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+
+class CompiledNet:
+    """Array view of a SUMO network.
+
+    nodes:  node_ids, node_xy
+    edges:  edge_ids, edge_type, edge_from, edge_to (node indices), edge_length, edge_speed
+    shapes: points of edge i are shape_xy[shape_start[i]:shape_start[i + 1]], in [0, 1]
+            relative to boundary (y pointing up)
+    lanes:  lane_ids, lane_edge (edge index, -1 for internal lanes), lane_length,
+            lane_speed, lane_xy (first shape point)
+    """
+
+    FIELDS = ("node_ids", "node_xy", "edge_ids", "edge_type", "edge_from", "edge_to", "edge_length",
+              "edge_speed", "shape_start", "shape_xy", "boundary", "lane_ids", "lane_edge", "lane_length",
+              "lane_speed", "lane_xy")
+
+    def __init__(self, **arrays):
+        for name in self.FIELDS:
+            setattr(self, name, arrays[name])
+        self._edge_index = None
+
+    @property
+    def edge_index(self):
+        if self._edge_index is None:
+            self._edge_index = {e: i for i, e in enumerate(self.edge_ids.tolist())}
+        return self._edge_index
+
+    def getBoundary(self):
+        return tuple(float(v) for v in self.boundary)
+
+    def edge_shape(self, i):
+        """Normalised shape of edge i as an (n, 2) array."""
+        return self.shape_xy[self.shape_start[i]:self.shape_start[i + 1]]
+
+    def canvas_shapes(self, width, height):
+        """All edge shapes scaled to a canvas with y pointing down: (points, starts)."""
+        points = np.empty(self.shape_xy.shape, dtype=np.float32)
+        points[:, 0] = self.shape_xy[:, 0] * width
+        points[:, 1] = (1.0 - self.shape_xy[:, 1]) * height
+        return points, self.shape_start
+
+
+def _parse_shape(text):
+    return [tuple(map(float, p.split(",")[:2])) for p in text.split()]
+
+
+def _edge_shape(lane_shapes):
+    """Same rule as sumolib: the middle lane, or the point-wise mean of all lanes."""
+    if len(lane_shapes) % 2 == 1:
+        return lane_shapes[len(lane_shapes) // 2]
+    n = min(len(s) for s in lane_shapes)
+    return [(sum(s[i][0] for s in lane_shapes) / len(lane_shapes),
+             sum(s[i][1] for s in lane_shapes) / len(lane_shapes)) for i in range(n)]
+
+
+def _open(filename):
+    return gzip.open(filename, "rb") if filename.endswith(".gz") else open(filename, "rb")
+
+
+def compile_network(filename):
+    """Stream the net file once and return a CompiledNet."""
+    boundary = None
+    node_ids, node_xy = [], []
+    edge_ids, edge_type, edge_nodes, edge_length, edge_speed, edge_shapes = [], [], [], [], [], []
+    lane_ids, lane_edge, lane_length, lane_speed, lane_xy = [], [], [], [], []
+    current_edge = None  # index into edge_ids, or -1 for internal/crossing/walkingarea edges
+    lane_shapes = []
+    depth = 0
+    root = None
+
+    with _open(filename) as f:
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = elem
+                if elem.tag == "edge":
+                    lane_shapes = []
+                    if elem.get("function"):
+                        current_edge = -1
+                    else:
+                        current_edge = len(edge_ids)
+                        edge_ids.append(elem.get("id"))
+                        edge_type.append(elem.get("type", ""))
+                        edge_nodes.append((elem.get("from"), elem.get("to")))
+                continue
+
+            depth -= 1
+            tag = elem.tag
+            if tag == "lane" and current_edge is not None:
+                shape = _parse_shape(elem.get("shape", ""))
+                lane_ids.append(elem.get("id"))
+                lane_edge.append(current_edge)
+                lane_length.append(float(elem.get("length")))
+                lane_speed.append(float(elem.get("speed")))
+                lane_xy.append(shape[0] if shape else (0.0, 0.0))
+                if current_edge >= 0:
+                    if not lane_shapes:
+                        edge_length.append(lane_length[-1])
+                        edge_speed.append(lane_speed[-1])
+                    lane_shapes.append(shape)
+            elif tag == "edge":
+                if current_edge >= 0:
+                    edge_shapes.append(_edge_shape(lane_shapes) if lane_shapes else [])
+                current_edge = None
+            elif tag == "junction" and elem.get("type") != "internal":
+                node_ids.append(elem.get("id"))
+                node_xy.append((float(elem.get("x")), float(elem.get("y"))))
+            elif tag == "location":
+                boundary = tuple(map(float, elem.get("convBoundary").split(",")))
+            if depth == 1:
+                root.clear()
+
+    node_index = {n: i for i, n in enumerate(node_ids)}
+    min_x, min_y, max_x, max_y = boundary
+    span = np.array([max(max_x - min_x, 1e-9), max(max_y - min_y, 1e-9)])
+    shape_start = np.zeros(len(edge_shapes) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in edge_shapes], out=shape_start[1:])
+    points = [p for s in edge_shapes for p in s]
+    shape_xy = ((np.array(points, dtype=np.float64).reshape(-1, 2) - (min_x, min_y)) / span).astype(np.float32)
+
+    return CompiledNet(
+        node_ids=np.array(node_ids, dtype=str),
+        node_xy=np.array(node_xy, dtype=np.float64).reshape(-1, 2),
+        edge_ids=np.array(edge_ids, dtype=str),
+        edge_type=np.array(edge_type, dtype=str),
+        edge_from=np.array([node_index[a] for a, _ in edge_nodes], dtype=np.int32),
+        edge_to=np.array([node_index[b] for _, b in edge_nodes], dtype=np.int32),
+        edge_length=np.array(edge_length, dtype=np.float64),
+        edge_speed=np.array(edge_speed, dtype=np.float64),
+        shape_start=shape_start,
+        shape_xy=shape_xy,
+        boundary=np.array(boundary, dtype=np.float64),
+        lane_ids=np.array(lane_ids, dtype=str),
+        lane_edge=np.array(lane_edge, dtype=np.int32),
+        lane_length=np.array(lane_length, dtype=np.float64),
+        lane_speed=np.array(lane_speed, dtype=np.float64),
+        lane_xy=np.array(lane_xy, dtype=np.float64).reshape(-1, 2),
+    )
+
+
+def file_hash(filename):
+    digest = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_network(filename, cache_dir=None):
+    """Return the CompiledNet for filename, using (and refreshing) the on-disk cache."""
+    cache_dir = cache_dir or filename + ".cache"
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    digest = file_hash(filename)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("hash") == digest and manifest.get("version") == CACHE_VERSION:
+            return CompiledNet(**{name: np.load(os.path.join(cache_dir, name + ".npy"), mmap_mode="r")
+                                  for name in CompiledNet.FIELDS})
+    except (OSError, ValueError):
+        pass
+
+    net = compile_network(filename)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in CompiledNet.FIELDS:
+            np.save(os.path.join(cache_dir, name + ".npy"), getattr(net, name))
+        with open(manifest_path, "w") as f:
+            json.dump({"hash": digest, "version": CACHE_VERSION, "source": os.path.basename(filename)}, f)
+    except OSError as e:
+        print(f"Network cache not written ({e}); continuing without it.")
+    return net
@@ -0,0 +1,268 @@
+"""Batched LSTM congestion prediction running beside the control loop.
+
+The engine hands every snapshot to PredictionService.observe(), which keeps
+a sliding window of per-edge features (vehicle count, mean speed, mean
+waiting time, density in veh/km).  Every `every` steps the whole window is
+queued for the service thread, which runs the model over all edges in
+batches and publishes a congestion probability per edge.  If a pass
+exceeds the inference budget it stops early and the next pass resumes
+where it stopped, so the control loop never waits for the model.
+
+The bundled model (lstm_traffic_AImodel.h5) takes (window=10, features=4)
+sequences.  To run it where only a TFLite runtime (ai_edge_litert or
+tflite_runtime) is installed, export it once:
+
+    python prediction.py --export-tflite lstm_traffic_AImodel.tflite
+    python prediction.py --benchmark --model lstm_traffic_AImodel.tflite
+
+TensorFlow (or a standalone TFLite runtime) is imported only inside the
+service thread.  The .h5 model was saved by Keras 2, which Keras 3 cannot
+read; it is loaded through tf_keras (pip install tf_keras) when that is
+installed, else TF_USE_LEGACY_KERAS=1 is set before TensorFlow is imported.
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+import traceback
+
+import numpy as np
+
+MODEL_PATH = "lstm_traffic_AImodel.h5"
+TFLITE_BATCH = 256
+FEATURES = 4
+
+
+def legacy_keras():
+    """The Keras 2 API the bundled .h5 model needs: tf_keras, or tf.keras under TF_USE_LEGACY_KERAS."""
+    try:
+        import tf_keras
+        return tf_keras
+    except ImportError:
+        # Only effective before TensorFlow's first import in this process.
+        os.environ.setdefault("TF_USE_LEGACY_KERAS", "1")
+        from tensorflow import keras
+        return keras
+
+
+class KerasRunner:
+    def __init__(self, path, batch_size=1024):
+        self.model = legacy_keras().models.load_model(path, compile=False)
+        self.window = self.model.input_shape[1]
+        self.batch_size = batch_size
+
+    def predict(self, x):
+        return np.asarray(self.model.predict_on_batch(x)).reshape(-1)
+
+
+class TFLiteRunner:
+    """Fixed-batch TFLite interpreter; partial batches are zero-padded.
+
+    The converted LSTM keeps its state in variable tensors, which are reset
+    before every batch so the sequences stay independent.
+    """
+
+    def __init__(self, path):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=path)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size, self.window = int(self.input["shape"][0]), int(self.input["shape"][1])
+
+    def predict(self, x):
+        n = len(x)
+        if n < self.batch_size:
+            x = np.concatenate((x, np.zeros((self.batch_size - n,) + x.shape[1:], dtype=x.dtype)))
+        self.interpreter.reset_all_variables()
+        self.interpreter.set_tensor(self.input["index"], x)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output["index"]).reshape(-1)[:n]
+
+
+def load_runner(path):
+    return TFLiteRunner(path) if path.endswith(".tflite") else KerasRunner(path)
+
+
+def export_tflite(model_path=MODEL_PATH, out_path="lstm_traffic_AImodel.tflite", batch_size=TFLITE_BATCH):
+    """Convert the Keras model to a fixed-batch TFLite flatbuffer (LSTMs need static shapes)."""
+    keras = legacy_keras()
+    import tensorflow as tf
+    model = keras.models.load_model(model_path, compile=False)
+    inputs = keras.Input(shape=model.input_shape[1:], batch_size=batch_size)
+    fixed = keras.Model(inputs, model(inputs))
+    with open(out_path, "wb") as f:
+        f.write(tf.lite.TFLiteConverter.from_keras_model(fixed).convert())
+    return out_path
+
+
+class PredictionService(threading.Thread):
+    """Sliding per-edge feature window plus an inference thread.
+
+    net: netcache.CompiledNet (edge order matches the engine and router)
+    every: steps between inference passes
+    budget_ms: wall-time limit of one pass
+    """
+
+    def __init__(self, net, model_path=MODEL_PATH, every=10, budget_ms=250.0, threshold=0.5, window=10):
+        super().__init__(daemon=True)
+        self.edge_ids = np.asarray(net.edge_ids)
+        self.edge_km = np.maximum(np.asarray(net.edge_length, dtype=np.float32), 1.0) / 1000.0
+        self.model_path = model_path
+        self.every = every
+        self.budget_ms = budget_ms
+        self.threshold = threshold
+        self.window = window
+        self.history = np.zeros((window, len(self.edge_ids), FEATURES), dtype=np.float32)
+        self.cursor = 0
+        self.filled = 0
+        self.steps = 0
+        self.requests = queue.Queue(maxsize=1)
+        self.stop_event = threading.Event()
+        self.ready = threading.Event()
+        self.error = None
+        self.runner = None
+        self._next_edge = 0
+
+        # Published results: replaced as a whole, never mutated
+        self.probabilities = np.zeros(len(self.edge_ids), dtype=np.float32)
+        self.predicted = frozenset()
+
+        self.load_ms = 0.0
+        self.runs = 0
+        self.skipped = 0
+        self.edges_predicted = 0
+        self.inference_ms = 0.0
+        self.last_ms = 0.0
+
+    def reset(self):
+        """Empty the feature window and the published predictions before a new run; the model stays loaded."""
+        try:
+            self.requests.get_nowait()
+        except queue.Empty:
+            pass
+        self.history[:] = 0
+        self.cursor = self.filled = self.steps = 0
+        self._next_edge = 0
+        self.probabilities = np.zeros(len(self.edge_ids), dtype=np.float32)
+        self.predicted = frozenset()
+
+    def observe(self, snapshot):
+        """Record one step of features; called from the simulation thread."""
+        states = snapshot.edges
+        row = self.history[self.cursor]
+        row[:, :3] = [states.get(edge_id, (0, 0.0, 0.0)) for edge_id in self.edge_ids.tolist()]
+        row[:, 3] = row[:, 0] / self.edge_km
+        self.cursor = (self.cursor + 1) % self.window
+        self.filled = min(self.filled + 1, self.window)
+        self.steps += 1
+        if self.filled == self.window and self.steps % self.every == 0 and self.ready.is_set():
+            # (edges, window, features), oldest step first
+            batch = np.ascontiguousarray(np.roll(self.history, -self.cursor, axis=0).transpose(1, 0, 2))
+            try:
+                self.requests.put_nowait(batch)
+            except queue.Full:
+                self.skipped += 1
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            self.runner = load_runner(self.model_path)
+            if self.runner.window != self.window:
+                raise ValueError(f"model expects a window of {self.runner.window} steps, not {self.window}")
+        except Exception as e:
+            self.error = e
+            if not os.path.exists(self.model_path):
+                print(f"AI model {self.model_path} not found; running without prediction.")
+            else:
+                print(f"AI model {self.model_path} failed to load; running without prediction:")
+                traceback.print_exc()
+            return
+        self.load_ms = (time.perf_counter() - started) * 1000
+        print(f"AI model loaded in {self.load_ms:.0f} ms; predicting every {self.every} steps.")
+        self.ready.set()
+        while not self.stop_event.is_set():
+            try:
+                batch = self.requests.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self.infer(batch)
+
+    def infer(self, x):
+        started = time.perf_counter()
+        n = len(x)
+        probabilities = self.probabilities.copy()
+        done, i = 0, self._next_edge
+        while done < n:
+            size = min(self.runner.batch_size, n - done)
+            rows = np.arange(i, i + size) % n
+            probabilities[rows] = self.runner.predict(x[rows])
+            done += size
+            i = (i + size) % n
+            if (time.perf_counter() - started) * 1000 > self.budget_ms:
+                break
+        self._next_edge = i
+        self.probabilities = probabilities
+        self.predicted = frozenset(self.edge_ids[probabilities > self.threshold].tolist())
+        self.last_ms = (time.perf_counter() - started) * 1000
+        self.inference_ms += self.last_ms
+        self.edges_predicted += done
+        self.runs += 1
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        seconds = self.inference_ms / 1000
+        return {
+            "load_ms": round(self.load_ms, 1),
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "last_ms": round(self.last_ms, 2),
+            "mean_ms": round(self.inference_ms / self.runs, 2) if self.runs else 0.0,
+            "edges_per_s": round(self.edges_predicted / seconds) if seconds else 0,
+            "predicted_edges": len(self.predicted),
+        }
+
+
+def benchmark(model_path, edges, repeat):
+    started = time.perf_counter()
+    runner = load_runner(model_path)
+    load_ms = (time.perf_counter() - started) * 1000
+    x = np.random.default_rng(0).random((edges, runner.window, FEATURES), dtype=np.float32)
+    times = []
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        for first in range(0, edges, runner.batch_size):
+            runner.predict(x[first:first + runner.batch_size])
+        times.append(time.perf_counter() - started)
+    best = min(times[1:])  # the first pass includes graph tracing
+    print(f"{model_path}: load {load_ms:.0f} ms, {edges} edges in {best * 1000:.1f} ms "
+          f"({edges / best:,.0f} edges/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Congestion model utilities.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--export-tflite", metavar="OUT", help="write a fixed-batch TFLite version of --model")
+    parser.add_argument("--benchmark", action="store_true", help="time loading and one pass over --edges edges")
+    parser.add_argument("--edges", type=int, default=674)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.export_tflite:
+        print(f"wrote {export_tflite(args.model, args.export_tflite)}")
+    if args.benchmark:
+        benchmark(args.model, args.edges, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Step-level instrumentation: stage latency histograms, TraCI traffic and counters.
+
+The engine and the GUI time each stage of the loop with
+
+    with profiler.stage("detect"):
+        ...
+
+Every stage records into a fixed histogram with log-spaced buckets, so
+memory is constant however long the run and recording costs two
+perf_counter calls and a bisect.  instrument_connection() adds the TraCI
+side: round trips, commands and bytes in each direction, plus a
+"traci_io" stage for the time spent waiting on SUMO.
+
+Results can be written as JSON or CSV, or served in the Prometheus text
+format on localhost:
+
+    python engine.py --steps 600 --profile profile.json --prometheus-port 9108
+    curl localhost:9108/metrics
+
+--cprofile FIRST COUNT captures a cProfile of steps FIRST..FIRST+COUNT-1
+of the engine thread for a closer look at one window.
+"""
+import bisect
+import contextlib
+import cProfile
+import csv
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bucket bounds in seconds (1-2.5-5 steps from 10 us to 10 s); the last bucket is +Inf.
+BUCKETS = tuple(m * 10.0 ** e for e in range(-5, 1) for m in (1, 2.5, 5)) + (10.0,)
+QUANTILES = (0.5, 0.9, 0.99)
+CSV_FIELDS = ["stage", "count", "total_ms", "mean_ms", "max_ms"] + [f"p{round(q * 100)}_ms" for q in QUANTILES]
+METRIC_PREFIX = "v2i"
+
+
+class Histogram:
+    """Counts of observations per bucket, with sum and max."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimate, interpolated linearly inside the bucket that holds the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class _Stage:
+    """Reusable timing context of one stage; a stage is timed from one thread at a time."""
+
+    __slots__ = ("histogram", "errors", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.errors = 0
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started)
+        if exc_type is not None:
+            self.errors += 1
+        return False
+
+
+class Profiler:
+    """Stage histograms and named counters of one run."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.stages = {}
+        self.counters = {}
+        self.steps = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._window = None  # (first step, last step, output path)
+        self._cprofile = None
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            with self._lock:
+                stage = self.stages.setdefault(name, _Stage(Histogram(self.buckets)))
+        return stage
+
+    def observe(self, name, seconds):
+        self.stage(name).histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def profile_window(self, first_step, steps, path="cprofile.prof"):
+        """Run cProfile over steps first_step..first_step + steps - 1 (1-based) and dump it to path."""
+        self._window = (first_step, first_step + steps - 1, path)
+
+    @contextlib.contextmanager
+    def step(self):
+        """Times one whole loop step as the "step" stage and drives the cProfile window."""
+        number = self.steps + 1
+        window = self._window
+        if window and number == window[0]:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        try:
+            with self.stage("step"):
+                yield
+        finally:
+            self.steps = number
+            if self._cprofile is not None and number >= window[1]:
+                self._cprofile.disable()
+                self._cprofile.dump_stats(window[2])
+                print(f"cProfile of steps {window[0]}-{number} written to {window[2]}")
+                self._cprofile = self._window = None
+
+    # --- export ---
+
+    def stage_rows(self):
+        rows = []
+        for name, stage in list(self.stages.items()):
+            h = stage.histogram
+            row = {"stage": name, "count": h.count, "total_ms": round(h.sum * 1000, 3),
+                   "mean_ms": round(h.sum * 1000 / h.count, 4) if h.count else 0.0,
+                   "max_ms": round(h.max * 1000, 3)}
+            for q, field in zip(QUANTILES, CSV_FIELDS[5:]):
+                row[field] = round(h.quantile(q) * 1000, 4)
+            rows.append(row)
+        return rows
+
+    def snapshot(self):
+        """Everything recorded so far as plain JSON-compatible data."""
+        stages = {}
+        bounds = [*map(str, self.buckets), "+Inf"]
+        for row in self.stage_rows():
+            name = row.pop("stage")
+            stage = self.stages[name]
+            stages[name] = dict(row, errors=stage.errors, buckets=dict(zip(bounds, stage.histogram.counts)))
+        return {"started": self.started, "elapsed_s": round(time.time() - self.started, 3), "steps": self.steps,
+                "stages": stages, "counters": dict(self.counters)}
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=1)
+
+    def write_csv(self, path):
+        """One row per stage; counters follow as rows with only stage and count set."""
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.stage_rows())
+            for name, value in sorted(self.counters.items()):
+                writer.writerow({"stage": name, "count": value})
+
+    def write(self, path):
+        """write_csv for a .csv path, write_json otherwise."""
+        if path.endswith(".csv"):
+            self.write_csv(path)
+        else:
+            self.write_json(path)
+
+    def prometheus_text(self):
+        p = METRIC_PREFIX
+        lines = [f"# HELP {p}_stage_seconds Wall time of each loop stage.",
+                 f"# TYPE {p}_stage_seconds histogram"]
+        for name, stage in list(self.stages.items()):
+            h = stage.histogram
+            cumulative = 0
+            for bound, n in zip([*map(repr, self.buckets), "+Inf"], h.counts):
+                cumulative += n
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {h.sum!r}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {h.count}')
+        lines += [f"# TYPE {p}_stage_errors_total counter"]
+        lines += [f'{p}_stage_errors_total{{stage="{name}"}} {stage.errors}' for name, stage in list(self.stages.items())]
+        lines += [f"# TYPE {p}_steps_total counter", f"{p}_steps_total {self.steps}"]
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /profile.json from a daemon thread; returns the server."""
+        profiler = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, kind = profiler.prometheus_text().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/profile.json":
+                    body, kind = json.dumps(profiler.snapshot()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def summary(self):
+        """Short text table of the stages, slowest total first."""
+        rows = sorted(self.stage_rows(), key=lambda row: -row["total_ms"])
+        lines = [f"{'stage':<16}{'count':>8}{'mean ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        lines += [f"{r['stage']:<16}{r['count']:>8}{r['mean_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['max_ms']:>10.3f}"
+                  for r in rows]
+        if self.counters:
+            lines.append(", ".join(f"{name}={value}" for name, value in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+
+def instrument_connection(conn, profiler):
+    """Count round trips, commands and bytes of a TraCI connection; False if it has no socket layer (libsumo)."""
+    send = getattr(conn, "_sendExact", None)
+    if send is None or getattr(send, "profiler", None) is profiler:
+        return send is not None
+    io = profiler.stage("traci_io")
+    counters = profiler.counters
+
+    def send_exact():
+        commands, sent = len(conn._queue), len(conn._string) + 4
+        with io:
+            result = send()
+        counters["traci_messages"] = counters.get("traci_messages", 0) + 1
+        counters["traci_commands"] = counters.get("traci_commands", 0) + commands
+        counters["traci_bytes_sent"] = counters.get("traci_bytes_sent", 0) + sent
+        counters["traci_bytes_received"] = counters.get("traci_bytes_received", 0) + len(result._content) + 4
+        return result
+
+    send_exact.profiler = profiler
+    conn._sendExact = send_exact
+    return True
@@ -0,0 +1,321 @@
+"""Record engine frames to disk and replay them without SUMO.
+
+A recording is a directory:
+
+    meta.json    format version, network file and the engine's edge order
+    names.txt    interned strings (edge, lane and vehicle ids), one per line;
+                 code i is line i and the first codes are the engine edges
+    frames.bin   one zlib-compressed record per step, appended
+    index.bin    one fixed-size INDEX_DTYPE entry per step, appended last
+
+A record holds the per-edge count/speed/wait and class arrays, every
+vehicle (id, edge, speed, position), arrivals and reroute events, all as
+flat little-endian arrays.  The float columns are byte-shuffled before
+compression, which roughly halves their size.  The index is memory-mapped:
+seeking to any step is one lookup plus one decompression, so playback can
+jump, scrub backwards or run at any speed.  The index also holds per-step
+counts (vehicles, congested edges, reroutes), so whole-run charts come
+straight from it without touching the records.
+
+    python engine.py --steps 3600 --record runs/peak
+    python replay.py runs/peak                 # summary and seek timing
+    python interface.py --replay runs/peak     # GUI playback with a scrub bar
+"""
+import argparse
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from itertools import chain, repeat
+from operator import attrgetter
+
+import numpy as np
+
+from congestion import CONGESTED
+from engine import Frame, SimulationWorker
+from telemetry import EdgeState, Snapshot, VehicleState
+
+FORMAT_VERSION = 1
+INDEX_DTYPE = np.dtype([("offset", "<i8"), ("size", "<i4"), ("step", "<i4"), ("time", "<f8"),
+                        ("vehicles", "<i4"), ("congested", "<i4"), ("reroutes", "<i4"), ("rerouted_total", "<i4")])
+# step, time, expected, latest rerouted (name code or -1), vehicles, arrived, reroutes, route codes, step rate
+HEADER = struct.Struct("<idiiiiiid")
+COMPRESSION_LEVEL = 1  # level 6 saves ~6% for 1.5x the time per step
+_EMPTY = EdgeState(0, 0.0, 0.0)
+
+
+def _shuffle(a):
+    """Bytes of a 4-byte array grouped by byte position, so similar floats compress together."""
+    return np.ascontiguousarray(a, dtype="<f4").view(np.uint8).reshape(-1, 4).T.tobytes()
+
+
+def _unshuffle(buffer, n):
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(4, n).T.copy().view("<f4").ravel()
+
+
+class Recorder:
+    """Appends engine frames to a recording directory (replacing any recording already there)."""
+
+    def __init__(self, path, edge_ids, net_file=None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.edge_ids = list(edge_ids)
+        self.codes = {}
+        self.frames = open(os.path.join(path, "frames.bin"), "wb")
+        self.index = open(os.path.join(path, "index.bin"), "wb")
+        self.names = open(os.path.join(path, "names.txt"), "w", encoding="utf-8", newline="\n")
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"version": FORMAT_VERSION, "net_file": net_file and os.path.abspath(net_file),
+                       "edges": len(self.edge_ids)}, f)
+        for edge_id in self.edge_ids:
+            self._code(edge_id)
+        self.count = 0
+        self.rerouted_total = 0
+        self.raw_bytes = 0
+        self.offset = 0
+
+    def _code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.codes)
+            self.names.write(name + "\n")
+        return code
+
+    def append(self, frame):
+        snap = frame.snapshot
+        code = self._code
+        rows = chain.from_iterable(map(snap.edges.get, self.edge_ids, repeat(_EMPTY)))
+        states = np.fromiter(rows, dtype=np.float64, count=3 * len(self.edge_ids)).reshape(-1, 3)
+        vehicles = snap.vehicles
+        n = len(vehicles)
+        vehicle_ids = np.fromiter(map(code, vehicles), dtype="<i4", count=n)
+        vehicle_edges = np.fromiter(map(code, map(attrgetter("edge"), vehicles.values())), dtype="<i4", count=n)
+        values = chain.from_iterable((v.speed, *v.position) for v in vehicles.values())
+        vehicle_values = np.fromiter(values, dtype="<f4", count=3 * n).reshape(-1, 3)
+        arrived = np.fromiter(map(code, snap.arrived), dtype="<i4", count=len(snap.arrived))
+        reroutes = np.array([(code(v), len(old), len(new)) for v, old, new in frame.reroutes], dtype="<i4")
+        routes = np.array([code(e) for _, old, new in frame.reroutes for e in (*old, *new)], dtype="<i4")
+        latest = code(frame.latest_rerouted) if frame.latest_rerouted is not None else -1
+
+        raw = b"".join((
+            HEADER.pack(snap.step, snap.time, snap.expected, latest, len(vehicles), len(arrived),
+                        len(frame.reroutes), len(routes), frame.step_rate),
+            states[:, 0].astype("<i4").tobytes(), _shuffle(states[:, 1]), _shuffle(states[:, 2]),
+            np.asarray(frame.classes, dtype=np.int8).tobytes(),
+            vehicle_ids.tobytes(), vehicle_edges.tobytes(), _shuffle(vehicle_values.T.ravel()),
+            arrived.tobytes(), reroutes.tobytes(), routes.tobytes()))
+        record = zlib.compress(raw, COMPRESSION_LEVEL)
+        self.frames.write(record)
+        self.rerouted_total += len(frame.reroutes)
+        entry = np.array([(self.offset, len(record), snap.step, snap.time, len(vehicles), len(frame.congested),
+                           len(frame.reroutes), self.rerouted_total)], dtype=INDEX_DTYPE)
+        self.offset += len(record)
+        self.raw_bytes += len(raw)
+        self.count += 1
+        # Names and the record reach the file before the index entry that refers
+        # to them, so a reader following a live recording never sees half a step.
+        self.names.flush()
+        self.frames.flush()
+        self.index.write(entry.tobytes())
+        self.index.flush()
+
+    def close(self):
+        for f in (self.names, self.frames, self.index):
+            f.close()
+
+
+class Recording:
+    """Read side of a recording: random access to any step, no SUMO needed."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: recording format {self.meta.get('version')}, expected {FORMAT_VERSION}")
+        self.edge_count = self.meta["edges"]
+        self.names = []
+        self.index = np.empty(0, dtype=INDEX_DTYPE)
+        self._frames = None
+        self.refresh()
+
+    def refresh(self):
+        """Pick up steps appended since opening (for a recording that is still being written)."""
+        index_path = os.path.join(self.path, "index.bin")
+        frames_path = os.path.join(self.path, "frames.bin")
+        steps = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        if steps:
+            index = np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(steps,))
+            # An entry whose record is not fully on disk yet does not count.
+            end = index["offset"].astype(np.int64) + index["size"]
+            steps = int(np.searchsorted(end, os.path.getsize(frames_path), side="right"))
+            self.index = index[:steps]
+            self._frames = np.memmap(frames_path, dtype=np.uint8, mode="r")
+        with open(os.path.join(self.path, "names.txt"), encoding="utf-8", newline="\n") as f:
+            self.names = f.read().split("\n")[:-1]
+        self.edge_ids = self.names[:self.edge_count]
+        return len(self)
+
+    def __len__(self):
+        return len(self.index)
+
+    def position(self, step):
+        """Index of the first recorded frame at or after simulation step."""
+        return int(np.searchsorted(self.index["step"], step))
+
+    def arrays(self, i):
+        """Raw columns of frame i as NumPy arrays (names as codes into self.names)."""
+        entry = self.index[i]
+        raw = zlib.decompress(self._frames[entry["offset"]:entry["offset"] + entry["size"]])
+        step, sim_time, expected, latest, n_vehicles, n_arrived, n_reroutes, n_routes, step_rate = \
+            HEADER.unpack_from(raw)
+        pos = HEADER.size
+        cols = {"step": step, "time": sim_time, "expected": expected, "latest": latest, "step_rate": step_rate}
+        e = self.edge_count
+
+        def take(n, dtype):
+            nonlocal pos
+            size = n * np.dtype(dtype).itemsize
+            pos += size
+            return np.frombuffer(raw, dtype=dtype, count=n, offset=pos - size)
+
+        def take_floats(n):
+            nonlocal pos
+            chunk = raw[pos:pos + 4 * n]
+            pos += 4 * n
+            return _unshuffle(chunk, n)
+
+        cols["count"] = take(e, "<i4")
+        cols["speed"] = take_floats(e)
+        cols["wait"] = take_floats(e)
+        cols["classes"] = take(e, np.int8)
+        cols["vehicle"] = take(n_vehicles, "<i4")
+        cols["vehicle_edge"] = take(n_vehicles, "<i4")
+        speed_x_y = take_floats(3 * n_vehicles).reshape(3, n_vehicles)
+        cols["vehicle_speed"], cols["vehicle_x"], cols["vehicle_y"] = speed_x_y
+        cols["arrived"] = take(n_arrived, "<i4")
+        cols["reroutes"] = take(3 * n_reroutes, "<i4").reshape(-1, 3)
+        cols["routes"] = take(n_routes, "<i4")
+        return cols
+
+    def frame(self, i):
+        """Frame i rebuilt as the engine produced it (floats at single precision)."""
+        c = self.arrays(i)
+        names = self.names
+        edges = dict(zip(self.edge_ids, map(EdgeState._make, zip(c["count"].tolist(), c["speed"].tolist(),
+                                                                   c["wait"].tolist()))))
+        vehicles = {names[v]: VehicleState(s, names[e], (x, y)) for v, e, s, x, y in
+                    zip(c["vehicle"].tolist(), c["vehicle_edge"].tolist(), c["vehicle_speed"].tolist(),
+                        c["vehicle_x"].tolist(), c["vehicle_y"].tolist())}
+        arrived = tuple(names[v] for v in c["arrived"].tolist())
+        reroutes = []
+        routes = c["routes"].tolist()
+        pos = 0
+        for vehicle, n_old, n_new in c["reroutes"].tolist():
+            old = tuple(names[r] for r in routes[pos:pos + n_old])
+            new = tuple(names[r] for r in routes[pos + n_old:pos + n_old + n_new])
+            reroutes.append((names[vehicle], old, new))
+            pos += n_old + n_new
+        classes = c["classes"]
+        congested = frozenset(self.edge_ids[k] for k in np.flatnonzero(classes == CONGESTED).tolist())
+        snapshot = Snapshot(c["step"], c["time"], edges, vehicles, c["expected"], arrived)
+        latest = names[c["latest"]] if c["latest"] >= 0 else None
+        return Frame(snapshot, congested, classes, tuple(reroutes), arrived, latest, c["step_rate"])
+
+    def size_bytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, name))
+                   for name in ("meta.json", "names.txt", "frames.bin", "index.bin"))
+
+
+class ReplayWorker(SimulationWorker):
+    """Publishes the frames of a Recording like SimulationWorker does for a live engine.
+
+    speed is simulated seconds per wall second relative to real time
+    (0: as fast as the consumer takes them).  seek() may be called from any
+    thread; frames queued before it are discarded.  At the end of the
+    recording the worker waits for new steps (a recording still being
+    written) or a seek, until stop_event is set.
+    """
+
+    def __init__(self, recording, speed=1.0, position=0, max_frames=4):
+        super().__init__(None, max_frames)
+        self.recording = recording
+        self.speed = speed
+        self.position = position
+        self.paused = threading.Event()
+        self._lock = threading.Lock()
+
+    def seek(self, position):
+        """Continue from position; its frame is published at once, so scrubbing works while paused."""
+        with self._lock:
+            position = max(0, min(int(position), len(self.recording) - 1))
+            while True:
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    break
+            self.publish(self.recording.frame(position))
+            self.position = position + 1
+
+    def run(self):
+        try:
+            recording = self.recording
+            while not self.stop_event.is_set():
+                if self.paused.is_set():
+                    self.stop_event.wait(0.05)
+                    continue
+                with self._lock:
+                    i = self.position
+                    at_end = i >= len(recording) and recording.refresh() <= i
+                    if not at_end:
+                        frame = recording.frame(i)
+                        self.position = i + 1
+                        self.publish(frame)
+                if at_end:
+                    self.stop_event.wait(0.2)
+                    continue
+                if self.speed > 0 and i + 1 < len(recording):
+                    dt = float(recording.index["time"][i + 1] - recording.index["time"][i])
+                    self.stop_event.wait(max(dt, 0.0) / self.speed)
+        except Exception as e:
+            self.error = f"Replay error: {e}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a recording and time random seeks.")
+    parser.add_argument("recording")
+    parser.add_argument("--seeks", type=int, default=200, help="random frames to decode for the timing")
+    args = parser.parse_args()
+
+    recording = Recording(args.recording)
+    n = len(recording)
+    if not n:
+        print("empty recording")
+        return
+    index = recording.index
+    size = recording.size_bytes()
+    print(f"{n} steps (step {index['step'][0]}-{index['step'][-1]}, {index['time'][-1] - index['time'][0]:.0f} s "
+          f"simulated), {len(recording.names)} names, {size / 2**20:.2f} MiB, {size / n / 1024:.1f} KiB/step")
+    print(f"vehicles max {index['vehicles'].max()}, congested edges max {index['congested'].max()}, "
+          f"{index['rerouted_total'][-1]} reroutes")
+    raw = sum(len(zlib.decompress(recording._frames[o:o + s])) for o, s in zip(index["offset"][:100].tolist(),
+                                                                            index["size"][:100].tolist()))
+    print(f"compression {raw / index['size'][:100].sum():.1f}x (first {min(n, 100)} steps)")
+    rng = np.random.default_rng(0)
+    picks = rng.integers(n, size=args.seeks).tolist()
+    started = time.perf_counter()
+    for i in picks:
+        recording.arrays(i)
+    arrays_ms = (time.perf_counter() - started) * 1000 / len(picks)
+    started = time.perf_counter()
+    for i in picks:
+        recording.frame(i)
+    frame_ms = (time.perf_counter() - started) * 1000 / len(picks)
+    print(f"random seek: {arrays_ms:.2f} ms to arrays, {frame_ms:.2f} ms to a full Frame")
+
+
+if __name__ == "__main__":
+    main()
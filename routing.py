@@ -0,0 +1,278 @@
+"""Congestion-aware routing on a compact, array-backed road graph.
+
+Nodes and edges of the SUMO network are mapped to integer ids once.  The
+adjacency is stored CSR-style (per-node offsets into one array of outgoing
+edge indices) and edge weights are travel times that can be raised for
+congested edges on every step and reset when the congestion clears.
+"""
+import heapq
+import math
+from array import array
+from collections import OrderedDict
+
+MIN_SPEED = 0.1  # m/s, keeps the travel time of a stopped edge finite
+
+
+def _csr(keys, size):
+    """Group edge indices by key: returns (start offsets, edge indices)."""
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    start = array("i", [0] * (size + 1))
+    for e in order:
+        start[keys[e] + 1] += 1
+    for u in range(size):
+        start[u + 1] += start[u]
+    return start, array("i", order)
+
+
+class RoutingGraph:
+    """Directed road graph with integer ids and mutable travel-time weights."""
+
+    def __init__(self, node_ids, node_xy, edge_ids, edge_from, edge_to, edge_length, edge_speed):
+        self.node_ids = list(node_ids)
+        self.edge_ids = list(edge_ids)
+        self.node_index = {n: i for i, n in enumerate(self.node_ids)}
+        self.edge_index = {e: i for i, e in enumerate(self.edge_ids)}
+        self.node_x = array("d", (x for x, _ in node_xy))
+        self.node_y = array("d", (y for _, y in node_xy))
+        self.edge_from = array("i", edge_from)
+        self.edge_to = array("i", edge_to)
+        self.edge_length = array("d", edge_length)
+        self.free_time = array("d", (l / max(v, MIN_SPEED) for l, v in zip(edge_length, edge_speed)))
+        self.weight = array("d", self.free_time)
+        self.max_speed = max(max(edge_speed, default=MIN_SPEED), MIN_SPEED)
+        # SUMO edges can be shorter than the straight line between their nodes, so the
+        # A* bound is the distance scaled by the smallest length/distance ratio (at most 1).
+        ratio = 1.0
+        for e, length in enumerate(edge_length):
+            u, v = self.edge_from[e], self.edge_to[e]
+            distance = math.hypot(self.node_x[u] - self.node_x[v], self.node_y[u] - self.node_y[v])
+            if distance > 0:
+                ratio = min(ratio, length / distance)
+        self.heuristic_scale = ratio / self.max_speed
+        self._raised = set()
+        # Bumped whenever the set of congested edges changes; caches key on it.
+        self.epoch = 0
+
+        # CSR adjacency: outgoing edges of node u are adj_edges[adj_start[u]:adj_start[u + 1]],
+        # incoming edges likewise in rev_edges/rev_start.
+        self.adj_start, self.adj_edges = _csr(self.edge_from, len(self.node_ids))
+        self.rev_start, self.rev_edges = _csr(self.edge_to, len(self.node_ids))
+
+        # (from, to) -> edge; parallel edges resolve to the shortest one
+        self.pair_index = {}
+        for e in range(len(self.edge_ids)):
+            key = (self.edge_from[e], self.edge_to[e])
+            if key not in self.pair_index or edge_length[e] < edge_length[self.pair_index[key]]:
+                self.pair_index[key] = e
+
+    @classmethod
+    def from_net(cls, net):
+        """Build the graph from a sumolib network (normal edges only)."""
+        nodes = net.getNodes()
+        node_index = {n.getID(): i for i, n in enumerate(nodes)}
+        edges = [e for e in net.getEdges() if e.getFromNode() and e.getToNode()]
+        return cls([n.getID() for n in nodes], [n.getCoord()[:2] for n in nodes],
+                   [e.getID() for e in edges],
+                   [node_index[e.getFromNode().getID()] for e in edges],
+                   [node_index[e.getToNode().getID()] for e in edges],
+                   [e.getLength() for e in edges], [e.getSpeed() for e in edges])
+
+    @classmethod
+    def from_compiled(cls, net):
+        """Build the graph from a netcache.CompiledNet."""
+        return cls(net.node_ids.tolist(), net.node_xy.tolist(), net.edge_ids.tolist(),
+                   net.edge_from.tolist(), net.edge_to.tolist(),
+                   net.edge_length.tolist(), net.edge_speed.tolist())
+
+    def edge_between(self, from_node, to_node):
+        e = self.pair_index.get((self.node_index[from_node], self.node_index[to_node]))
+        return None if e is None else self.edge_ids[e]
+
+    def travel_time(self, edge_id, speed, wait=0.0):
+        """Observed travel time of an edge from its mean speed and waiting time."""
+        e = self.edge_index[edge_id]
+        return max(self.edge_length[e] / max(speed, MIN_SPEED) + wait, self.free_time[e])
+
+    def set_travel_times(self, updates):
+        """Apply {edge_id: seconds}; edges raised earlier but absent now go back to free flow."""
+        raised = set()
+        for edge_id, seconds in updates.items():
+            e = self.edge_index.get(edge_id)
+            if e is not None:
+                self.weight[e] = seconds
+                raised.add(e)
+        for e in self._raised - raised:
+            self.weight[e] = self.free_time[e]
+        if raised != self._raised:
+            self.epoch += 1
+        self._raised = raised
+
+    def _heuristic(self, u, target):
+        return math.hypot(self.node_x[u] - self.node_x[target],
+                          self.node_y[u] - self.node_y[target]) * self.heuristic_scale
+
+    def _search(self, source, target):
+        """A* over nodes; returns the edge indices of the cheapest path or None."""
+        dist = {source: 0.0}
+        via = {source: -1}
+        heap = [(self._heuristic(source, target), source)]
+        adj_start, adj_edges, edge_to, weight = self.adj_start, self.adj_edges, self.edge_to, self.weight
+        done = set()
+        while heap:
+            _, u = heapq.heappop(heap)
+            if u == target:
+                break
+            if u in done:
+                continue
+            done.add(u)
+            du = dist[u]
+            for i in range(adj_start[u], adj_start[u + 1]):
+                e = adj_edges[i]
+                v = edge_to[e]
+                dv = du + weight[e]
+                if dv < dist.get(v, math.inf):
+                    dist[v] = dv
+                    via[v] = e
+                    heapq.heappush(heap, (dv + self._heuristic(v, target), v))
+        else:
+            return None
+        path = []
+        u = target
+        while via[u] != -1:
+            e = via[u]
+            path.append(e)
+            u = self.edge_from[e]
+        path.reverse()
+        return path
+
+    def shortest_path(self, source_edge, dest_edge):
+        """Edge ids from source_edge to dest_edge (both included), or None."""
+        s = self.edge_index.get(source_edge)
+        d = self.edge_index.get(dest_edge)
+        if s is None or d is None:
+            return None
+        if s == d:
+            return [source_edge]
+        middle = self._search(self.edge_to[s], self.edge_from[d])
+        if middle is None:
+            return None
+        return [source_edge] + [self.edge_ids[e] for e in middle] + [dest_edge]
+
+    def alternative_paths(self, source_edge, dest_edge, k, penalty=0.5, first=None):
+        """Up to k distinct paths by the penalty method: [(seconds, edge ids)], cheapest first.
+
+        After each search the edges of the path found cost (1 + penalty)
+        times more, so the next search takes a detour where a reasonable one
+        exists.  Costs are under the unpenalised weights and leave out the
+        source and destination edges, which every path shares.  first is an
+        already known cheapest path (e.g. from RouteCache) that saves a search.
+        """
+        s = self.edge_index.get(source_edge)
+        d = self.edge_index.get(dest_edge)
+        if s is None or d is None:
+            return []
+        if s == d:
+            return [(0.0, [source_edge])]
+        weight = self.weight
+        saved = {}
+        found = {}
+        try:
+            for i in range(k):
+                if i == 0 and first is not None:
+                    middle = [self.edge_index[e] for e in first[1:-1]]
+                else:
+                    middle = self._search(self.edge_to[s], self.edge_from[d])
+                if middle is None:
+                    break
+                key = tuple(middle)
+                if key not in found:
+                    found[key] = sum(saved.get(e, weight[e]) for e in middle)
+                for e in middle:
+                    saved.setdefault(e, weight[e])
+                    weight[e] *= 1 + penalty
+        finally:
+            for e, w in saved.items():
+                weight[e] = w
+        return sorted((cost, [source_edge] + [self.edge_ids[e] for e in middle] + [dest_edge])
+                      for middle, cost in found.items())
+
+    def reverse_tree(self, dest_edge):
+        """Dijkstra towards dest_edge over reversed edges.
+
+        Returns, per node, the next edge on the cheapest path to the start
+        of dest_edge (-1 where it is unreachable).
+        """
+        target = self.edge_from[self.edge_index[dest_edge]]
+        dist = array("d", [math.inf]) * len(self.node_ids)
+        next_edge = array("i", [-1]) * len(self.node_ids)
+        dist[target] = 0.0
+        heap = [(0.0, target)]
+        rev_start, rev_edges, edge_from, weight = self.rev_start, self.rev_edges, self.edge_from, self.weight
+        while heap:
+            du, u = heapq.heappop(heap)
+            if du > dist[u]:
+                continue
+            for i in range(rev_start[u], rev_start[u + 1]):
+                e = rev_edges[i]
+                v = edge_from[e]
+                dv = du + weight[e]
+                if dv < dist[v]:
+                    dist[v] = dv
+                    next_edge[v] = e
+                    heapq.heappush(heap, (dv, v))
+        return next_edge
+
+
+class RouteCache:
+    """LRU cache of reverse shortest-path trees, one per destination.
+
+    All vehicles heading to the same destination share one tree, which is
+    rebuilt only after the graph's congestion epoch changes.  A tree costs a
+    search of the whole network, so for a single vehicle
+    RoutingGraph.shortest_path (A*) is cheaper; the cache pays off only when
+    several vehicles share a destination.
+    """
+
+    def __init__(self, graph, capacity=8):
+        self.graph = graph
+        self.capacity = capacity
+        self.trees = OrderedDict()
+        self.epoch = graph.epoch
+        self.hits = 0
+        self.misses = 0
+
+    def tree(self, dest_edge):
+        if self.epoch != self.graph.epoch:
+            self.trees.clear()
+            self.epoch = self.graph.epoch
+        tree = self.trees.get(dest_edge)
+        if tree is not None:
+            self.hits += 1
+            self.trees.move_to_end(dest_edge)
+            return tree
+        self.misses += 1
+        tree = self.trees[dest_edge] = self.graph.reverse_tree(dest_edge)
+        if len(self.trees) > self.capacity:
+            self.trees.popitem(last=False)
+        return tree
+
+    def path(self, source_edge, dest_edge):
+        """Same contract as RoutingGraph.shortest_path, read from the cached tree."""
+        g = self.graph
+        s = g.edge_index.get(source_edge)
+        if s is None or dest_edge not in g.edge_index:
+            return None
+        if source_edge == dest_edge:
+            return [source_edge]
+        next_edge = self.tree(dest_edge)
+        target = g.edge_from[g.edge_index[dest_edge]]
+        path = [source_edge]
+        u = g.edge_to[s]
+        while u != target:
+            e = next_edge[u]
+            if e == -1:
+                return None
+            path.append(g.edge_ids[e])
+            u = g.edge_to[e]
+        path.append(dest_edge)
+        return path
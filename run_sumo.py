@@ -1,46 +1,148 @@
-import traci
-import xml.etree.ElementTree as ET
-
-# Load RSU positions from `osm.add.xml`
-rsu_positions = {}
-tree = ET.parse("osm.add.xml")
-root = tree.getroot()
-for rsu in root.findall("inductionLoop"):
-    rsu_id = rsu.get("id")
-    lane = rsu.get("lane")
-    pos = float(rsu.get("pos"))
-    rsu_positions[rsu_id] = (lane, pos)
-
-print(f"Loaded {len(rsu_positions)} RSUs from osm.add.xml.")
-
-# Start SUMO simulation
-sumoCmd = ["sumo-gui", "-c", "osm.sumocfg"]
-traci.start(sumoCmd)
-
-step = 0
-while traci.simulation.getMinExpectedNumber() > 0:
-    traci.simulationStep()
-    active_vehicles = traci.vehicle.getIDList()
-
-    for vehicle_id in active_vehicles:
-        speed = traci.vehicle.getSpeed(vehicle_id)
-        lane_id = traci.vehicle.getLaneID(vehicle_id)
-        lane_pos = traci.vehicle.getLanePosition(vehicle_id)  # ✅ Get vehicle position
-
-        print(f"Step {step}: Vehicle {vehicle_id} | Speed: {speed:.2f} m/s | Lane: {lane_id} | Position: {lane_pos:.2f}")
-
-        # ✅ Check if vehicle is near an RSU (Induction Loop)
-        for rsu_id, (rsu_lane, rsu_pos) in rsu_positions.items():
-            if lane_id == rsu_lane:  # ✅ Same lane
-                distance = abs(lane_pos - rsu_pos)
-                if distance < 30:  # ✅ Within 30m range
-                    print(f"🚗➡️📡 Vehicle {vehicle_id} detected by RSU {rsu_id} at lane {lane_id}")
-
-                    # ✅ Example: Reduce vehicle speed near RSU
-                    new_speed = max(speed * 0.8, 5)  # Reduce by 20%, min 5 m/s
-                    traci.vehicle.setSpeed(vehicle_id, new_speed)
-                    print(f"🔽 Speed of {vehicle_id} reduced to {new_speed:.2f} m/s")
-
-    step += 1
-
-traci.close()
+"""Slow vehicles down as they pass an RSU (induction loop from osm.add.xml).
+
+Vehicle speed, lane and lane position arrive through one subscription.
+RSUs are indexed by lane with sorted positions, so matching every vehicle
+against every RSU is a single vectorized search per step, and the speed
+commands ride along with the next simulationStep.  A summary line is
+logged every --log-every steps, with a few sampled detections:
+
+    python run_sumo.py [--nogui] [--range 30] [--log-every 100]
+"""
+import argparse
+import logging
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import traci
+import traci.constants as tc
+
+from telemetry import CommandBatch, subscribe_all_vehicles
+
+VEHICLE_VARS = (tc.VAR_SPEED, tc.VAR_LANE_ID, tc.VAR_LANEPOSITION)
+RSU_RANGE = 30.0       # m along the lane
+SPEED_FACTOR = 0.8     # reduce by 20%
+MIN_SPEED = 5.0        # m/s
+# Lane positions never reach this, so lane * LANE_SPAN + pos orders by lane first.
+LANE_SPAN = 1e6
+
+log = logging.getLogger("run_sumo")
+
+
+class RSUIndex:
+    """RSU positions grouped by lane and sorted, for range queries over many vehicles at once."""
+
+    def __init__(self, rsus):
+        """rsus: iterable of (rsu_id, lane_id, pos)."""
+        rsus = list(rsus)
+        self.lane_code = {lane: i for i, lane in enumerate(sorted({lane for _, lane, _ in rsus}))}
+        codes = np.array([self.lane_code[lane] for _, lane, _ in rsus], dtype=np.float64)
+        pos = np.array([p for _, _, p in rsus], dtype=np.float64)
+        order = np.lexsort((pos, codes))
+        self.rsu_ids = [rsus[i][0] for i in order]
+        self.keys = codes[order] * LANE_SPAN + pos[order]
+
+    @classmethod
+    def from_additional(cls, path="osm.add.xml"):
+        root = ET.parse(path).getroot()
+        return cls((rsu.get("id"), rsu.get("lane"), float(rsu.get("pos"))) for rsu in root.iter("inductionLoop"))
+
+    def __len__(self):
+        return len(self.rsu_ids)
+
+    def nearest(self, lane_ids, positions, radius=RSU_RANGE):
+        """Index into rsu_ids of the closest RSU on the same lane within radius, or -1, per vehicle."""
+        lane_code = self.lane_code
+        codes = np.fromiter((lane_code.get(lane, -1) for lane in lane_ids), dtype=np.float64, count=len(lane_ids))
+        result = np.full(len(codes), -1, dtype=np.int64)
+        on_rsu_lane = np.flatnonzero(codes >= 0)
+        if not len(on_rsu_lane) or not len(self.keys):
+            return result
+        keys = codes[on_rsu_lane] * LANE_SPAN + np.asarray(positions, dtype=np.float64)[on_rsu_lane]
+        right = np.searchsorted(self.keys, keys)
+        left = np.maximum(right - 1, 0)
+        right = np.minimum(right, len(self.keys) - 1)
+        # Both neighbours are compared on the key, so an RSU on another lane is
+        # always at least LANE_SPAN away and never matches.
+        d_left = np.abs(self.keys[left] - keys)
+        d_right = np.abs(self.keys[right] - keys)
+        best = np.where(d_right < d_left, right, left)
+        hit = np.minimum(d_left, d_right) < radius
+        result[on_rsu_lane[hit]] = best[hit]
+        return result
+
+
+def run(conn, index, radius=RSU_RANGE, max_steps=None, log_every=100, log_samples=3):
+    anchor = subscribe_all_vehicles(conn, VEHICLE_VARS)
+    conn.simulation.subscribe((tc.VAR_MIN_EXPECTED_VEHICLES,))
+    commands = CommandBatch(conn)
+    step = detections = 0
+    window_vehicles = window_hits = 0
+    window_start = time.perf_counter()
+    samples = []
+    while max_steps is None or step < max_steps:
+        conn.simulationStep()
+        if conn.simulation.getSubscriptionResults()[tc.VAR_MIN_EXPECTED_VEHICLES] <= 0:
+            break
+        results = conn.junction.getContextSubscriptionResults(anchor) or {}
+        vehicle_ids = list(results)
+        values = list(results.values())
+        lanes = [v[tc.VAR_LANE_ID] for v in values]
+        positions = np.fromiter((v[tc.VAR_LANEPOSITION] for v in values), dtype=np.float64, count=len(values))
+        nearest = index.nearest(lanes, positions, radius)
+
+        hits = np.flatnonzero(nearest >= 0)
+        if len(hits):
+            speeds = np.fromiter((values[i][tc.VAR_SPEED] for i in hits.tolist()), dtype=np.float64, count=len(hits))
+            new_speeds = np.maximum(speeds * SPEED_FACTOR, MIN_SPEED)
+            for i, new_speed in zip(hits.tolist(), new_speeds.tolist()):
+                commands.set_speed(vehicle_ids[i], new_speed)
+            commands.flush()
+            if len(samples) < log_samples:
+                k = step % len(hits)
+                i = int(hits[k])
+                samples.append(f"{vehicle_ids[i]}@{index.rsu_ids[nearest[i]]}->{new_speeds[k]:.1f}")
+
+        step += 1
+        detections += len(hits)
+        window_vehicles += len(vehicle_ids)
+        window_hits += len(hits)
+        if log_every and step % log_every == 0:
+            elapsed = time.perf_counter() - window_start
+            log.info("step=%d vehicles=%d near_rsu=%d steps_per_s=%.1f ms_per_step=%.2f samples=%s",
+                     step, window_vehicles // log_every, window_hits, log_every / elapsed,
+                     elapsed * 1000 / log_every, ",".join(samples) or "-")
+            window_vehicles = window_hits = 0
+            window_start = time.perf_counter()
+            samples = []
+    return step, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reduce vehicle speeds near RSUs.")
+    parser.add_argument("-c", "--config", default="osm.sumocfg")
+    parser.add_argument("-a", "--additional", default="osm.add.xml", help="RSUs as induction loops")
+    parser.add_argument("--nogui", action="store_true", help="use sumo instead of sumo-gui")
+    parser.add_argument("--range", type=float, default=RSU_RANGE, help="detection range along the lane (m)")
+    parser.add_argument("--steps", type=int, default=None)
+    parser.add_argument("--log-every", type=int, default=100, help="steps per summary line (0: none)")
+    parser.add_argument("--log-samples", type=int, default=3, help="detections shown per summary line")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    index = RSUIndex.from_additional(args.additional)
+    print(f"Loaded {len(index)} RSUs from {args.additional}.")
+
+    sumo_cmd = ["sumo" if args.nogui else "sumo-gui", "-c", args.config]
+    traci.start(sumo_cmd, label="rsu")
+    conn = traci.getConnection("rsu")
+    started = time.perf_counter()
+    try:
+        steps, detections = run(conn, index, args.range, args.steps, args.log_every, args.log_samples)
+    finally:
+        conn.close()
+    print(f"{steps} steps in {time.perf_counter() - started:.1f} s, {detections} RSU detections")
+
+
+if __name__ == "__main__":
+    main()
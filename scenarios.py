@@ -0,0 +1,219 @@
+"""Parameter sweeps over many independent SUMO runs in a process pool.
+
+Every combination of RSU spacing, congestion thresholds, demand scale and
+seed is one scenario.  Each scenario runs headless in a worker process
+with its own TraCI label (and so its own port) and its own directory:
+
+    sweep/<scenario id>/rsu.add.xml     RSUs placed with that spacing
+    sweep/<scenario id>/detectors.xml   induction-loop output
+    sweep/<scenario id>/detector_store/ the same, ingested by detectors.py
+    sweep/<scenario id>/metrics.csv     per-step engine metrics
+    sweep/<scenario id>/summary.json    written last; marks the run as done
+
+Finished scenarios are skipped when the sweep is started again, so an
+interrupted sweep resumes where it stopped.  sweep/results.csv holds one
+row per finished scenario, with the flow and occupancy its RSUs measured
+next to the engine metrics:
+
+    python scenarios.py --min-distance 50 100 200 --scale 1 1.5 2 --steps 1800 --jobs 8
+"""
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from congestion import DEFAULT_THRESHOLDS
+from detectors import ingest, per_rsu
+from engine import SUMO_QUIET_ARGS, TrafficEngine
+from generate_rsu import place_rsus, rsu_lanes, write_additional
+from netcache import load_network
+from trips import TripTable, files_from_config, route_files_from_config
+
+Scenario = namedtuple("Scenario", ["min_distance", "min_count", "max_speed", "max_wait", "scale", "seed"])
+
+RESULT_FIELDS = ["steps", "sim_time", "wall_s", "steps_per_s", "rsus", "mean_vehicles", "mean_congested",
+                 "max_congested", "congestion_transitions", "rerouted_total", "rsu_mean_flow", "rsu_mean_occupancy",
+                 "rsu_max_occupancy", "step_ms_p50", "step_ms_p99"]
+
+
+def scenario_id(scenario):
+    return (f"d{scenario.min_distance:g}_c{scenario.min_count:g}_v{scenario.max_speed:g}_w{scenario.max_wait:g}"
+            f"_x{scenario.scale:g}_s{scenario.seed}")
+
+
+def is_rsu_file(path):
+    """True for additional files of induction loops, as generate_rsu.py writes them."""
+    with gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb") as f:
+        for _, elem in ET.iterparse(f, events=("start",)):
+            if elem.tag != "additional":
+                return elem.tag == "inductionLoop"
+    return False
+
+
+def scenario_additionals(config, rsu_file):
+    """The config's additional files with its RSU file(s) replaced by rsu_file."""
+    return [path for path in files_from_config(config, "additional-files") if not is_rsu_file(path)] + [rsu_file]
+
+
+def column(rows, key):
+    """One metrics CSV column as floats (a single 0 when there are no rows)."""
+    return np.array([float(row[key]) for row in rows]) if rows else np.zeros(1)
+
+
+def rsu_measurements(detector_file, store_dir):
+    """(mean flow in veh/h, mean occupancy in %, highest mean occupancy of one RSU) over the RSUs' intervals."""
+    records = ingest(detector_file, store_dir) if os.path.exists(detector_file) else 0
+    if not records:
+        return 0.0, 0.0, 0.0
+    rsus = [r for r in per_rsu(store_dir).values() if len(r["flow"])]
+    flow = np.array([float(r["flow"].mean()) for r in rsus])
+    occupancy = np.array([float(r["occupancy"].mean()) for r in rsus])
+    return float(flow.mean()), float(occupancy.mean()), float(occupancy.max())
+
+
+def run_scenario(scenario, out_dir, net_file, config, max_steps=None):
+    """Run one scenario to completion (or max_steps); returns its summary dict."""
+    name = scenario_id(scenario)
+    run_dir = os.path.abspath(os.path.join(out_dir, name))
+    os.makedirs(run_dir, exist_ok=True)
+
+    net = load_network(net_file)
+    placements = rsu_lanes(net, place_rsus(net, scenario.min_distance))
+    additional = os.path.join(run_dir, "rsu.add.xml")
+    # Loop output paths are relative to the additional file, i.e. inside run_dir.
+    write_additional(placements, additional, detector_file="detectors.xml")
+
+    thresholds = {"default": DEFAULT_THRESHOLDS._replace(min_count=scenario.min_count, max_speed=scenario.max_speed,
+                                                         max_wait=scenario.max_wait)}
+    additional_files = ",".join(scenario_additionals(config, additional))
+    sumo_args = SUMO_QUIET_ARGS + ["--no-warnings", "--additional-files", additional_files,
+                                   "--scale", str(scenario.scale), "--seed", str(scenario.seed)]
+    engine = TrafficEngine(net_file, config, label=name, sumo_args=sumo_args, thresholds=thresholds)
+    metrics_file = os.path.join(run_dir, "metrics.csv")
+    started = time.perf_counter()
+    engine.start()
+    try:
+        steps = engine.run(max_steps, metrics_file)
+    finally:
+        engine.close()
+    wall = time.perf_counter() - started
+    # SUMO has closed detectors.xml by now.
+    flow, occupancy, max_occupancy = rsu_measurements(os.path.join(run_dir, "detectors.xml"),
+                                                      os.path.join(run_dir, "detector_store"))
+
+    with open(metrics_file) as f:
+        rows = list(csv.DictReader(f))
+    step_ms = column(rows, "step_ms")
+    summary = dict(scenario._asdict(), id=name,
+                   steps=steps,
+                   sim_time=float(column(rows, "time")[-1]),
+                   wall_s=round(wall, 2),
+                   steps_per_s=round(steps / wall, 1) if wall else 0.0,
+                   rsus=len(placements),
+                   mean_vehicles=round(float(column(rows, "vehicles").mean()), 1),
+                   mean_congested=round(float(column(rows, "congested_edges").mean()), 2),
+                   max_congested=int(column(rows, "congested_edges").max()),
+                   congestion_transitions=engine.congestion.transitions,
+                   rerouted_total=engine.rerouted_total,
+                   rsu_mean_flow=round(flow, 1),
+                   rsu_mean_occupancy=round(occupancy, 2),
+                   rsu_max_occupancy=round(max_occupancy, 2),
+                   step_ms_p50=round(float(np.percentile(step_ms, 50)), 3),
+                   step_ms_p99=round(float(np.percentile(step_ms, 99)), 3))
+    tmp = os.path.join(run_dir, "summary.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(summary, f, indent=1)
+    os.replace(tmp, os.path.join(run_dir, "summary.json"))
+    return summary
+
+
+def load_summaries(out_dir):
+    """{scenario id: summary} of every finished run under out_dir."""
+    summaries = {}
+    if not os.path.isdir(out_dir):
+        return summaries
+    for name in os.listdir(out_dir):
+        try:
+            with open(os.path.join(out_dir, name, "summary.json")) as f:
+                summaries[name] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return summaries
+
+
+def write_results(summaries, path):
+    fields = ["id"] + list(Scenario._fields) + RESULT_FIELDS
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fields, extrasaction="ignore")
+        writer.writeheader()
+        for name in sorted(summaries):
+            writer.writerow(summaries[name])
+    os.replace(tmp, path)
+
+
+def sweep(scenarios, out_dir="sweep", net_file="osm.net.xml.gz", config="osm.sumocfg", max_steps=None, jobs=None,
+          force=False):
+    """Run every scenario not finished yet on a pool of jobs processes; returns all summaries."""
+    os.makedirs(out_dir, exist_ok=True)
+    # Build the network and trip caches once, before the workers read them.
+    load_network(net_file)
+    TripTable(route_files_from_config(config)).load()
+    summaries = {} if force else load_summaries(out_dir)
+    todo = [s for s in scenarios if scenario_id(s) not in summaries]
+    results_path = os.path.join(out_dir, "results.csv")
+    print(f"{len(scenarios)} scenarios, {len(scenarios) - len(todo)} already done, running {len(todo)} "
+          f"on {jobs or os.cpu_count()} processes")
+    started = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_scenario, s, out_dir, net_file, config, max_steps): s for s in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            name = scenario_id(futures[future])
+            try:
+                summaries[name] = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(todo)}] {name} failed: {e}")
+                continue
+            write_results(summaries, results_path)
+            s = summaries[name]
+            print(f"[{done}/{len(todo)}] {name}: {s['steps']} steps in {s['wall_s']} s, "
+                  f"{s['rerouted_total']} rerouted, mean congested {s['mean_congested']}")
+    write_results(summaries, results_path)
+    print(f"{len(todo) - failed} runs in {time.perf_counter() - started:.1f} s ({failed} failed), "
+          f"results in {results_path}")
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep RSU spacing, congestion thresholds and demand in parallel.")
+    parser.add_argument("-c", "--config", default="osm.sumocfg")
+    parser.add_argument("-n", "--net", default="osm.net.xml.gz")
+    parser.add_argument("-o", "--out", default="sweep", help="one sub-directory per scenario plus results.csv")
+    parser.add_argument("--min-distance", type=float, nargs="+", default=[100], help="RSU spacing (m)")
+    parser.add_argument("--min-count", type=float, nargs="+", default=[DEFAULT_THRESHOLDS.min_count])
+    parser.add_argument("--max-speed", type=float, nargs="+", default=[DEFAULT_THRESHOLDS.max_speed])
+    parser.add_argument("--max-wait", type=float, nargs="+", default=[DEFAULT_THRESHOLDS.max_wait])
+    parser.add_argument("--scale", type=float, nargs="+", default=[1.0], help="demand scale (sumo --scale)")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[42])
+    parser.add_argument("--steps", type=int, default=None, help="steps per run (default: until the scenario ends)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="parallel runs (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rerun scenarios that already finished")
+    args = parser.parse_args()
+
+    scenarios = [Scenario(*values) for values in itertools.product(
+        args.min_distance, args.min_count, args.max_speed, args.max_wait, args.scale, args.seeds)]
+    sweep(scenarios, args.out, args.net, args.config, args.steps, args.jobs, args.force)
+
+
+if __name__ == "__main__":
+    main()
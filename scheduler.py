@@ -0,0 +1,137 @@
+"""Admission control for rerouting: a per-step budget, priorities and alternative paths.
+
+A jam can put hundreds of vehicles on congested edges at once.  Rerouting
+all of them in one step makes that step as slow as the jam is large, and
+sending them all along the same cheapest detour only moves the jam there.
+RerouteScheduler therefore
+
+* admits at most `budget` vehicles per step, those that have waited
+  longest first; the others are deferred and compete again next step.
+  A vehicle no path can be planned for takes no place in the budget and
+  is left out until the congestion changes,
+* computes up to k alternative paths per (edge, destination) with the
+  penalty method and hands them out by load, so vehicles leaving the same
+  edge for the same destination split over the detours.
+
+SUMO does the actual routing (it knows lane permissions and turn
+restrictions, the graph here does not).  A vehicle is steered onto its
+alternative by making the edges of the other alternatives more expensive
+for that vehicle only; the engine queues those commands and the reroutes
+in one telemetry.CommandBatch.
+"""
+import heapq
+from collections import OrderedDict
+
+REROUTE_BUDGET = 10  # vehicles rerouted per step; 0 admits all of them
+ALTERNATIVES = 3  # paths per (edge, destination)
+PATH_PENALTY = 0.5  # penalty method: edges of a path found cost 1 + PATH_PENALTY times more for the next search
+MAX_STRETCH = 1.3  # alternatives costlier than this times the cheapest are not used
+STEERING_PENALTY = 4.0  # per-vehicle factor 1 + STEERING_PENALTY on edges of the alternatives it was not given
+
+
+class RerouteScheduler:
+    """Chooses which vehicles to reroute in a step and which alternative each one takes."""
+
+    def __init__(self, graph, route_cache=None, budget=REROUTE_BUDGET, alternatives=ALTERNATIVES,
+                 penalty=PATH_PENALTY, max_stretch=MAX_STRETCH, capacity=256):
+        self.graph = graph
+        self.route_cache = route_cache
+        self.budget = budget
+        self.alternatives = max(alternatives, 1)
+        self.penalty = penalty
+        self.max_stretch = max_stretch
+        self.capacity = capacity
+        # (source, destination) -> [[cost, path, vehicles assigned], ...]; valid for one congestion epoch
+        self.options = OrderedDict()
+        # Vehicles that could not be planned; also valid for one congestion epoch
+        self.unplannable = set()
+        self.epoch = graph.epoch
+        self.deferred = 0  # candidates left waiting by the last admit()
+        self.deferred_total = 0
+
+    def admit(self, candidates, plan):
+        """[(vehicle_id, plan)] of the vehicles to reroute now, most urgent first.
+
+        candidates: (waiting time, edge waiting time, vehicle_id) tuples.
+        plan(vehicle_id) returns the vehicle's plan, or None when there is
+        none; such a vehicle does not count against the budget and is not
+        tried again until the congestion epoch changes.
+        """
+        self._sync_epoch()
+        heap = [(-wait, -edge_wait, vehicle_id) for wait, edge_wait, vehicle_id in candidates
+                if vehicle_id not in self.unplannable]
+        heapq.heapify(heap)
+        admitted = []
+        while heap and not (self.budget and len(admitted) >= self.budget):
+            vehicle_id = heapq.heappop(heap)[2]
+            result = plan(vehicle_id)
+            if result is None:
+                self.unplannable.add(vehicle_id)
+            else:
+                admitted.append((vehicle_id, result))
+        self.deferred = len(heap)
+        self.deferred_total += self.deferred
+        return admitted
+
+    def reset(self):
+        """Forget the alternatives, back-offs and deferral counts, e.g. before a new run."""
+        self.options.clear()
+        self.unplannable.clear()
+        self.epoch = self.graph.epoch
+        self.deferred = 0
+        self.deferred_total = 0
+
+    def _sync_epoch(self):
+        if self.epoch != self.graph.epoch:
+            self.options.clear()
+            self.unplannable.clear()
+            self.epoch = self.graph.epoch
+
+    def paths(self, source_edge, dest_edge, shared=False):
+        """The usable alternatives from source_edge to dest_edge under the current weights.
+
+        shared: other candidates in this step head to dest_edge too, so
+        the first path comes from the route cache's tree for dest_edge (one
+        reverse Dijkstra for all of them) instead of an A* search.
+        """
+        self._sync_epoch()
+        key = (source_edge, dest_edge)
+        options = self.options.get(key)
+        if options is not None:
+            self.options.move_to_end(key)
+            return options
+        first = self.route_cache.path(source_edge, dest_edge) if shared and self.route_cache is not None else None
+        found = self.graph.alternative_paths(source_edge, dest_edge, self.alternatives, self.penalty, first)
+        best = found[0][0] if found else 0.0
+        options = [[cost, path, 0] for cost, path in found if cost <= best * self.max_stretch]
+        self.options[key] = options
+        if len(self.options) > self.capacity:
+            self.options.popitem(last=False)
+        return options
+
+    def assign(self, source_edge, dest_edge, shared=False):
+        """(path, avoid) for the next vehicle, or None if there is no path to take.
+
+        The alternative with the lowest cost * (vehicles already sent along it + 1)
+        wins: equal paths take turns and a dearer one gets proportionally fewer
+        vehicles.  avoid lists (edge id, seconds) for the edges of the other
+        alternatives, to be set as that vehicle's own travel times.
+        """
+        if source_edge == dest_edge:
+            return None
+        options = self.paths(source_edge, dest_edge, shared)
+        if not options:
+            return None
+        chosen = min(options, key=lambda option: option[0] * (option[2] + 1))
+        chosen[2] += 1
+        path = chosen[1]
+        if len(options) == 1:
+            return path, []
+        keep = set(path)
+        graph = self.graph
+        avoid = {}
+        for option in options:
+            for edge in option[1]:
+                if edge not in keep and edge not in avoid:
+                    avoid[edge] = graph.weight[graph.edge_index[edge]] * (1 + STEERING_PENALTY)
+        return path, list(avoid.items())
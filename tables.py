@@ -0,0 +1,81 @@
+"""Keyed, paginated Treeview tables for the dashboard.
+
+The table keeps the full data set as a {key: raw} model but only one page
+of it lives in the Treeview.  On every refresh the visible page is diffed
+against what is on screen, so only inserted, changed or removed rows cost
+a Tk call, and rows are formatted only while they are visible.
+"""
+import math
+import tkinter as tk
+from itertools import islice
+
+
+class KeyedTable:
+    """Diff-based view of a {key: raw} model in a ttk.Treeview.
+
+    formatter(key, raw) returns the row values; its result is reused while
+    the raw value is the same object, so immutable rows are formatted once.
+    """
+
+    def __init__(self, tree, formatter, page_size=100, pager_parent=None):
+        self.tree = tree
+        self.formatter = formatter
+        self.page_size = page_size
+        self.page = 0
+        self.model = {}
+        self.shown = {}    # key -> (raw, values) currently in the tree
+        self.order = []    # visible keys in display order
+        self.page_label = None
+        if pager_parent is not None:
+            pager = tk.Frame(pager_parent, bg=pager_parent["bg"])
+            pager.pack()
+            tk.Button(pager, text="◀", command=lambda: self.turn(-1)).pack(side="left")
+            self.page_label = tk.Label(pager, bg=pager_parent["bg"])
+            self.page_label.pack(side="left", padx=5)
+            tk.Button(pager, text="▶", command=lambda: self.turn(1)).pack(side="left")
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(len(self.model) / self.page_size))
+
+    def turn(self, delta):
+        self.page = min(max(self.page + delta, 0), self.pages - 1)
+        self.refresh()
+
+    def set_rows(self, rows):
+        self.model = rows
+        self.refresh()
+
+    def refresh(self):
+        self.page = min(self.page, self.pages - 1)
+        first = self.page * self.page_size
+        keys = list(islice(self.model, first, first + self.page_size))
+        visible = set(keys)
+
+        gone = [key for key in self.shown if key not in visible]
+        if gone:
+            self.tree.delete(*gone)
+            for key in gone:
+                del self.shown[key]
+        # Rows that stay on screen must keep their relative order; new rows are
+        # then inserted straight into their final position.
+        kept = [key for key in keys if key in self.shown]
+        if kept != [key for key in self.order if key in visible]:
+            for index, key in enumerate(kept):
+                self.tree.move(key, "", index)
+
+        for index, key in enumerate(keys):
+            raw = self.model[key]
+            cached = self.shown.get(key)
+            if cached is not None and cached[0] is raw:
+                continue
+            values = self.formatter(key, raw)
+            if cached is None:
+                self.tree.insert("", index, iid=key, values=values)
+            elif cached[1] != values:
+                self.tree.item(key, values=values)
+            self.shown[key] = (raw, values)
+        self.order = keys
+
+        if self.page_label is not None:
+            self.page_label.config(text=f"{self.page + 1}/{self.pages} ({len(self.model)} rows)")
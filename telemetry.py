@@ -0,0 +1,163 @@
+"""Per-step traffic telemetry gathered through TraCI subscriptions.
+
+Instead of querying every edge and vehicle on each step, the edges are
+subscribed once and all vehicles are covered by a single context
+subscription.  SUMO then pushes every value together with the
+simulationStep answer, so one step costs a single round trip.
+
+Commands go the other way through CommandBatch, which queues them into
+the same message as the next simulationStep.
+"""
+import contextlib
+import math
+import struct
+from collections import namedtuple
+
+import traci
+import traci.constants as tc
+
+EDGE_VARS = (tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_MEAN_SPEED, tc.VAR_WAITING_TIME)
+VEHICLE_VARS = (tc.VAR_SPEED, tc.VAR_ROAD_ID, tc.VAR_POSITION, tc.VAR_ACCUMULATED_WAITING_TIME, tc.VAR_EDGES)
+
+# count: vehicles on the edge, speed: mean speed (m/s), wait: mean waiting time (s)
+EdgeState = namedtuple("EdgeState", ["count", "speed", "wait"])
+# wait: accumulated waiting time (s) over SUMO's waiting-time memory; 0 in recordings
+# route: edge ids of the vehicle's current route, its destination last; empty in recordings
+VehicleState = namedtuple("VehicleState", ["speed", "edge", "position", "wait", "route"], defaults=(0.0, ()))
+# expected: vehicles still running or waiting to depart (0 once the scenario is done)
+# arrived: ids of vehicles that left the simulation in this step
+Snapshot = namedtuple("Snapshot", ["step", "time", "edges", "vehicles", "expected", "arrived"])
+
+
+def subscribe_all_vehicles(conn, variables):
+    """Subscribe variables of every vehicle; returns the junction to read the context results from.
+
+    One context subscription around any junction, with a radius that spans
+    the whole network, reports every vehicle in the simulation.
+    """
+    (x1, y1), (x2, y2) = conn.simulation.getNetBoundary()
+    radius = math.hypot(x2 - x1, y2 - y1) + 1.0
+    anchor = conn.junction.getIDList()[0]
+    conn.junction.subscribeContext(anchor, tc.CMD_GET_VEHICLE_VARIABLE, radius, variables)
+    return anchor
+
+
+class Telemetry:
+    """Subscribes to edge and vehicle variables and turns results into snapshots."""
+
+    def __init__(self, edge_ids, connection=traci):
+        self.edge_ids = list(edge_ids)
+        self.conn = connection
+        self.anchor = None
+        self.step = 0
+
+    def subscribe(self):
+        self.conn.simulation.subscribe((tc.VAR_TIME, tc.VAR_MIN_EXPECTED_VEHICLES, tc.VAR_ARRIVED_VEHICLES_IDS))
+        for edge_id in self.edge_ids:
+            self.conn.edge.subscribe(edge_id, EDGE_VARS)
+        self.anchor = subscribe_all_vehicles(self.conn, VEHICLE_VARS)
+
+    def resubscribe(self):
+        """Fetch the current results again after a step whose answer was lost.
+
+        A subscription command is answered with the current values at once,
+        so subscribing everything again (one round trip per edge) refills
+        the results; the old ones are dropped first so that vehicles which
+        have left do not linger in the context results.
+        """
+        for results in getattr(self.conn, "_subscriptionMapping", {}).values():
+            results.reset()
+        self.subscribe()
+
+    def poll(self):
+        """Build the snapshot for the step that was just simulated (no round trips)."""
+        edges = {}
+        for edge_id, values in self.conn.edge.getAllSubscriptionResults().items():
+            count = values[tc.LAST_STEP_VEHICLE_NUMBER]
+            edges[edge_id] = EdgeState(count, values[tc.LAST_STEP_MEAN_SPEED],
+                                       values[tc.VAR_WAITING_TIME] / max(count, 1))
+        vehicles = {}
+        results = self.conn.junction.getContextSubscriptionResults(self.anchor) or {}
+        for vehicle_id, values in results.items():
+            vehicles[vehicle_id] = VehicleState(values[tc.VAR_SPEED], values[tc.VAR_ROAD_ID],
+                                                values[tc.VAR_POSITION], values[tc.VAR_ACCUMULATED_WAITING_TIME],
+                                                values[tc.VAR_EDGES])
+        self.step += 1
+        sim = self.conn.simulation.getSubscriptionResults()
+        return Snapshot(self.step, sim[tc.VAR_TIME], edges, vehicles, sim[tc.VAR_MIN_EXPECTED_VEHICLES],
+                        tuple(sim[tc.VAR_ARRIVED_VEHICLES_IDS]))
+
+
+class CommandBatch:
+    """Set commands sent together with the next TraCI message instead of one round trip each.
+
+    TraCI accepts several commands in one message.  Queued commands are
+    appended to the connection's outgoing message, so they reach SUMO with
+    the next simulationStep and traci checks their replies as usual.
+    Connections without such a buffer (libsumo) run the commands on flush().
+
+    SUMO answers a command it rejects with an error and carries on with the
+    rest, the step included; traci then raises the TraCIException from
+    simulationStep() (see TrafficEngine.step).  flush() skips rejected
+    commands the same way and counts them in rejected.
+    """
+
+    def __init__(self, connection=traci):
+        self.conn = connection
+        self.pipelined = hasattr(connection, "_queue") and hasattr(connection, "_string")
+        self.pending = []
+        self.queued = 0
+        self.rejected = 0
+
+    def set_speed(self, vehicle_id, speed):
+        if self.pipelined:
+            self._queue(tc.CMD_SET_VEHICLE_VARIABLE, tc.VAR_SPEED, vehicle_id, struct.pack("!Bd", tc.TYPE_DOUBLE, speed))
+        else:
+            self.pending.append((self.conn.vehicle.setSpeed, vehicle_id, speed))
+
+    def adapt_travel_time(self, edge_id, seconds):
+        """Travel time SUMO assumes for the edge whenever it routes a vehicle."""
+        if self.pipelined:
+            self._queue(tc.CMD_SET_EDGE_VARIABLE, tc.VAR_EDGE_TRAVELTIME, edge_id,
+                        struct.pack("!BiBd", tc.TYPE_COMPOUND, 1, tc.TYPE_DOUBLE, seconds))
+        else:
+            self.pending.append((self.conn.edge.adaptTraveltime, edge_id, seconds))
+
+    def set_vehicle_travel_time(self, vehicle_id, edge_id, seconds):
+        """Travel time of the edge for this vehicle only; it takes precedence over the edge's own."""
+        if self.pipelined:
+            edge = str(edge_id).encode("utf8")
+            self._queue(tc.CMD_SET_VEHICLE_VARIABLE, tc.VAR_EDGE_TRAVELTIME, vehicle_id,
+                        struct.pack("!BiBi", tc.TYPE_COMPOUND, 2, tc.TYPE_STRING, len(edge)) + edge
+                        + struct.pack("!Bd", tc.TYPE_DOUBLE, seconds))
+        else:
+            self.pending.append((self.conn.vehicle.setAdaptedTraveltime, vehicle_id, edge_id, seconds))
+
+    def change_target(self, vehicle_id, edge_id):
+        """Let SUMO route the vehicle to a new destination edge."""
+        if self.pipelined:
+            edge = str(edge_id).encode("utf8")
+            self._queue(tc.CMD_SET_VEHICLE_VARIABLE, tc.CMD_CHANGETARGET, vehicle_id,
+                        struct.pack("!Bi", tc.TYPE_STRING, len(edge)) + edge)
+        else:
+            self.pending.append((self.conn.vehicle.changeTarget, vehicle_id, edge_id))
+
+    def _queue(self, command, variable, object_id, packed):
+        conn = self.conn
+        object_id = str(object_id).encode("utf8")
+        length = 1 + 1 + 1 + 4 + len(object_id) + len(packed)
+        header = struct.pack("!BB", length, command) if length <= 255 else struct.pack("!BiB", 0, length + 4, command)
+        with getattr(conn, "_lock", contextlib.nullcontext()):
+            conn._queue.append(command)
+            conn._string += header + struct.pack("!Bi", variable, len(object_id)) + object_id + packed
+        self.queued += 1
+
+    def flush(self):
+        """Run commands that could not be queued; queued ones leave with the next message anyway."""
+        for method, *args in self.pending:
+            try:
+                method(*args)
+            except traci.exceptions.TraCIException:
+                self.rejected += 1
+        self.queued += len(self.pending)
+        self.pending.clear()
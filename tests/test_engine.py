@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pytest
+import sumolib
+
+from conftest import ROOT
+from engine import SUMO_QUIET_ARGS, TrafficEngine
+
+pytestmark = pytest.mark.skipif(shutil.which("sumo") is None, reason="sumo not installed")
+
+
+NET_FILE = os.path.join(ROOT, "osm.net.xml.gz")
+
+
+def osm_engine(label):
+    # Without osm.add.xml, whose RSUs would write detector_output.xml into the tree
+    sumo_args = SUMO_QUIET_ARGS + ["--no-warnings", "--end", "200",
+                                   "--additional-files", os.path.join(ROOT, "osm.poly.xml.gz")]
+    return TrafficEngine(NET_FILE, os.path.join(ROOT, "osm.sumocfg"), label=label, sumo_args=sumo_args)
+
+
+def test_rejected_command_does_not_lose_the_step():
+    no_cars = next(e.getID() for e in sumolib.net.readNet(NET_FILE).getEdges() if not e.allows("passenger"))
+    engine = osm_engine("test_rejected")
+    engine.start()
+    try:
+        for _ in range(100):
+            engine.step()
+        car = next(v for v in engine.snapshot.vehicles if engine.conn.vehicle.getVehicleClass(v) == "passenger")
+        before = engine.snapshot
+        engine.commands.change_target(car, no_cars)
+        frame = engine.step()
+        assert engine.profiler.counters["commands_rejected"] == 1
+        assert frame.snapshot.time == before.time + 1
+        assert frame.snapshot.vehicles
+        assert set(frame.snapshot.vehicles) == set(engine.conn.vehicle.getIDList())
+        assert engine.step().snapshot.time == before.time + 2
+    finally:
+        engine.close()
+
+
+def test_restart_begins_a_new_run():
+    engine = osm_engine("test_restart")
+    engine.start()
+    try:
+        engine.run(120)
+    finally:
+        engine.close()
+    assert engine.rerouted_vehicles
+    # As if the scenario had ended, which used to end a restarted worker at once
+    engine.snapshot = engine.snapshot._replace(expected=0)
+    assert engine.finished
+
+    engine.start()
+    try:
+        assert not engine.finished
+        assert not engine.rerouted_vehicles and engine.rerouted_total == 0
+        assert engine.congestion.samples == 0 and engine.scheduler.deferred_total == 0
+        assert engine.step().snapshot.time == 1.0
+    finally:
+        engine.close()
@@ -0,0 +1,66 @@
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+import sumolib
+
+from netcache import compile_network, load_network
+from routing import RoutingGraph
+
+
+@pytest.fixture(scope="module")
+def net_file(tmp_path_factory):
+    """A small grid with two lanes, sidewalks and crossings, so internal, crossing and walking area edges exist."""
+    if shutil.which("netgenerate") is None:
+        pytest.skip("netgenerate not installed")
+    path = str(tmp_path_factory.mktemp("net") / "small.net.xml.gz")
+    subprocess.run(["netgenerate", "--grid", "--grid.number", "3", "--grid.length", "100",
+                    "--default.lanenumber", "2", "--sidewalks.guess", "--crossings.guess", "--seed", "1", "-o", path],
+                   check=True, stdout=subprocess.DEVNULL)
+    return path
+
+
+def test_compiled_network_matches_sumolib(net_file):
+    net = sumolib.net.readNet(net_file)
+    compiled = compile_network(net_file)
+
+    nodes = {n.getID(): n.getCoord()[:2] for n in net.getNodes()}
+    assert dict(zip(compiled.node_ids.tolist(), map(tuple, compiled.node_xy.tolist()))) == nodes
+    assert compiled.getBoundary() == pytest.approx(tuple(c for corner in net.getBBoxXY() for c in corner))
+
+    edges = {e.getID(): e for e in net.getEdges()}
+    assert sorted(compiled.edge_ids.tolist()) == sorted(edges)
+    node_ids = compiled.node_ids.tolist()
+    for i, edge_id in enumerate(compiled.edge_ids.tolist()):
+        edge = edges[edge_id]
+        assert node_ids[compiled.edge_from[i]] == edge.getFromNode().getID()
+        assert node_ids[compiled.edge_to[i]] == edge.getToNode().getID()
+        assert compiled.edge_type[i] == edge.getType()
+        assert compiled.edge_length[i] == pytest.approx(edge.getLength())
+        assert compiled.edge_speed[i] == pytest.approx(edge.getSpeed())
+
+    normal = compiled.lane_edge >= 0
+    lanes = {lane.getID(): lane for e in edges.values() for lane in e.getLanes()}
+    assert sorted(compiled.lane_ids[normal].tolist()) == sorted(lanes)
+    for lane_id, edge, length, speed in zip(compiled.lane_ids.tolist(), compiled.lane_edge.tolist(),
+                                            compiled.lane_length.tolist(), compiled.lane_speed.tolist()):
+        if edge >= 0:
+            lane = lanes[lane_id]
+            assert compiled.edge_ids[edge] == lane.getEdge().getID()
+            assert (length, speed) == pytest.approx((lane.getLength(), lane.getSpeed()))
+
+
+def test_cached_network_routes_like_sumolib(net_file, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    compiled = load_network(net_file, cache_dir)
+    cached = load_network(net_file, cache_dir)
+    assert isinstance(cached.edge_length, np.memmap)
+    for name in compiled.FIELDS:
+        assert np.array_equal(getattr(cached, name), getattr(compiled, name)), name
+
+    ours, theirs = RoutingGraph.from_compiled(cached), RoutingGraph.from_net(sumolib.net.readNet(net_file))
+    edges = sorted(ours.edge_ids)
+    for source in edges:
+        for dest in edges:
+            assert ours.shortest_path(source, dest) == theirs.shortest_path(source, dest)
@@ -0,0 +1,28 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from prediction import FEATURES, MODEL_PATH, PredictionService, load_runner
+
+pytest.importorskip("tensorflow")
+MODEL = os.path.join(ROOT, MODEL_PATH)
+
+
+def test_shipped_model_loads_and_predicts():
+    runner = load_runner(MODEL)
+    assert runner.window == 10
+    p = runner.predict(np.zeros((3, runner.window, FEATURES), dtype=np.float32))
+    assert p.shape == (3,) and np.all((p >= 0) & (p <= 1))
+
+
+def test_service_starts_with_shipped_model():
+    net = SimpleNamespace(edge_ids=np.array(["a", "b"]), edge_length=np.array([100.0, 50.0]))
+    service = PredictionService(net, MODEL)
+    service.start()
+    try:
+        assert service.ready.wait(120), service.error
+    finally:
+        service.stop()
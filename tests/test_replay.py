@@ -0,0 +1,63 @@
+import numpy as np
+
+from congestion import BUSY, CONGESTED, FREE
+from engine import Frame
+from replay import Recorder, Recording, ReplayWorker
+from telemetry import EdgeState, Snapshot, VehicleState
+
+EDGES = ["e0", "e1", "e2", "-e2"]
+
+
+def synthetic_frames(n=6):
+    """Frames with values that single precision holds exactly, so they must come back unchanged."""
+    frames = []
+    for step in range(1, n + 1):
+        edges = {e: EdgeState(step + i, 0.5 * i + step, 0.25 * step) for i, e in enumerate(EDGES)}
+        vehicles = {f"veh{v}": VehicleState(1.5 * v, EDGES[(v + step) % len(EDGES)], (10.0 * v, -2.5 * step))
+                    for v in range(step % 4 + 1)}
+        classes = np.array([CONGESTED if (i + step) % 3 == 0 else (BUSY if i % 2 else FREE)
+                            for i in range(len(EDGES))], dtype=np.int8)
+        congested = frozenset(e for e, c in zip(EDGES, classes.tolist()) if c == CONGESTED)
+        reroutes = ((f"veh{step % 3}", ("e0", "e1"), ("e0", "e2", "-e2")),) if step % 2 else ()
+        arrived = (f"gone{step}",) if step % 3 == 0 else ()
+        latest = reroutes[-1][0] if reroutes else None
+        snapshot = Snapshot(step, float(step), edges, vehicles, 10 - step, arrived)
+        frames.append(Frame(snapshot, congested, classes, reroutes, arrived, latest, 100.0 + step))
+    return frames
+
+
+def assert_same(frame, expected):
+    assert frame.snapshot == expected.snapshot
+    assert frame.congested == expected.congested
+    assert np.array_equal(frame.classes, expected.classes)
+    assert frame.reroutes == expected.reroutes
+    assert frame.arrived == expected.arrived
+    assert frame.latest_rerouted == expected.latest_rerouted
+    assert frame.step_rate == expected.step_rate
+
+
+def test_recording_round_trip_seek_and_replay(tmp_path):
+    frames = synthetic_frames()
+    recorder = Recorder(str(tmp_path), EDGES)
+    for frame in frames:
+        recorder.append(frame)
+    recorder.close()
+
+    recording = Recording(str(tmp_path))
+    assert len(recording) == len(frames)
+    assert recording.index["rerouted_total"][-1] == sum(len(f.reroutes) for f in frames)
+    for i in reversed(range(len(frames))):
+        assert_same(recording.frame(i), frames[i])
+    assert recording.position(4) == 3
+
+    worker = ReplayWorker(recording, speed=0.0, max_frames=len(frames) + 1)
+    worker.seek(2)
+    assert_same(worker.frames.get(timeout=5), frames[2])
+    worker.start()
+    try:
+        for expected in frames[3:]:
+            assert_same(worker.frames.get(timeout=5), expected)
+    finally:
+        worker.stop_event.set()
+        worker.join()
+    assert worker.error is None
@@ -0,0 +1,39 @@
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from netcache import load_network
+from routing import RouteCache, RoutingGraph
+
+
+@pytest.fixture(scope="module")
+def grid(tmp_path_factory):
+    """The grid-20 network of benchmarks/suite.py; every edge there is shorter than its node distance."""
+    if shutil.which("netgenerate") is None:
+        pytest.skip("netgenerate not installed")
+    work = tmp_path_factory.mktemp("grid")
+    net_file = str(work / "grid-20.net.xml.gz")
+    subprocess.run(["netgenerate", "--grid", "--grid.number", "20", "--grid.length", "150", "--no-turnarounds",
+                    "--seed", "42", "-o", net_file], check=True, stdout=subprocess.DEVNULL)
+    return RoutingGraph.from_compiled(load_network(net_file, str(work / "net.cache")))
+
+
+def cost(graph, path):
+    return sum(graph.weight[graph.edge_index[e]] for e in path[1:-1])
+
+
+def test_astar_matches_dijkstra_under_random_congestion(grid):
+    rng = random.Random(1)
+    edges = grid.edge_ids
+    for _ in range(50):
+        grid.set_travel_times({e: grid.free_time[grid.edge_index[e]] * rng.uniform(1, 6)
+                               for e in rng.sample(edges, len(edges) // 5)})
+        cache = RouteCache(grid)
+        for _ in range(30):
+            source, dest = rng.sample(edges, 2)
+            astar, dijkstra = grid.shortest_path(source, dest), cache.path(source, dest)
+            assert (astar is None) == (dijkstra is None)
+            if astar is not None:
+                assert cost(grid, astar) == pytest.approx(cost(grid, dijkstra), rel=1e-9)
@@ -0,0 +1,24 @@
+import pytest
+
+from scenarios import rsu_measurements
+
+DETECTORS = """<detector>
+    <interval begin="0.00" end="1.00" id="rsu_0" nVehContrib="1" flow="3600.00" occupancy="20.00" speed="5.00"/>
+    <interval begin="0.00" end="1.00" id="rsu_1" nVehContrib="0" flow="0.00" occupancy="0.00" speed="-1.00"/>
+    <interval begin="1.00" end="2.00" id="rsu_0" nVehContrib="0" flow="0.00" occupancy="10.00" speed="-1.00"/>
+    <interval begin="1.00" end="2.00" id="rsu_1" nVehContrib="0" flow="0.00" occupancy="0.00" speed="-1.00"/>
+</detector>
+"""
+
+
+def test_rsu_measurements_average_each_rsu_then_all(tmp_path):
+    detector_file = tmp_path / "detectors.xml"
+    detector_file.write_text(DETECTORS)
+    flow, occupancy, max_occupancy = rsu_measurements(str(detector_file), str(tmp_path / "store"))
+    assert flow == pytest.approx(900.0)
+    assert occupancy == pytest.approx(7.5)
+    assert max_occupancy == pytest.approx(15.0)
+
+
+def test_rsu_measurements_without_output(tmp_path):
+    assert rsu_measurements(str(tmp_path / "missing.xml"), str(tmp_path / "store")) == (0.0, 0.0, 0.0)
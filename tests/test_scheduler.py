@@ -0,0 +1,72 @@
+import os
+from types import SimpleNamespace
+
+from conftest import ROOT
+from engine import TrafficEngine
+from routing import RoutingGraph
+from scheduler import RerouteScheduler
+from telemetry import CommandBatch, EdgeState, Snapshot, VehicleState
+
+
+def line_graph():
+    """a -> b -> c -> d along the x axis, 100 m per edge."""
+    nodes = ["n0", "n1", "n2", "n3"]
+    return RoutingGraph(nodes, [(100.0 * i, 0.0) for i in range(4)], ["a", "b", "c"],
+                        [0, 1, 2], [1, 2, 3], [100.0] * 3, [10.0] * 3)
+
+
+def test_unplannable_vehicle_takes_no_budget_until_the_epoch_changes():
+    graph = line_graph()
+    scheduler = RerouteScheduler(graph, budget=1)
+    destinations = {"stuck": "a", "waiting": "c"}
+    tried = []
+
+    def plan(vehicle_id):
+        tried.append(vehicle_id)
+        return scheduler.assign("a", destinations[vehicle_id])
+
+    candidates = [(900.0, 30.0, "stuck"), (5.0, 30.0, "waiting")]
+    admitted = scheduler.admit(candidates, plan)
+    assert [vehicle_id for vehicle_id, _ in admitted] == ["waiting"]
+    assert scheduler.deferred == 0
+    assert tried == ["stuck", "waiting"]
+
+    tried.clear()
+    scheduler.admit(candidates[:1], plan)
+    assert tried == []
+
+    graph.set_travel_times({"b": 60.0})
+    scheduler.admit(candidates[:1], plan)
+    assert tried == ["stuck"]
+
+
+class FakeConnection:
+    """Buffers queued commands like a traci Connection; any query would fail."""
+
+    def __init__(self):
+        self._queue = []
+        self._string = b""
+
+
+def test_vehicle_without_a_destination_to_reroute_to_never_takes_budget():
+    trips = SimpleNamespace(load=lambda: None, destination=lambda vehicle_id: None)
+    engine = TrafficEngine(os.path.join(ROOT, "osm.net.xml.gz"), os.path.join(ROOT, "osm.sumocfg"),
+                           trips=trips, reroute_budget=1)
+    router = engine.router
+    edge, dest = next((source, dest) for source, dest in zip(router.edge_ids, router.edge_ids[1:])
+                      if router.shortest_path(source, dest))
+    engine.conn = FakeConnection()
+    engine.commands = CommandBatch(engine.conn)
+    engine.congested_edges = frozenset([edge])
+    vehicles = {"arrived": VehicleState(0.0, edge, 0.0, 900.0, (dest, edge)),
+                "unknown": VehicleState(0.0, edge, 0.0, 600.0),
+                "waiting": VehicleState(0.0, edge, 0.0, 5.0, (edge, dest))}
+    engine.snapshot = Snapshot(0, 0.0, {edge: EdgeState(3, 0.0, 30.0)}, vehicles, 3, 0)
+
+    engine.update_vehicle_data()
+    assert list(engine.rerouted_vehicles) == ["waiting"]
+    assert engine.rerouted_vehicles["waiting"]["old"] == (edge, dest)
+    assert engine.reroutes_deferred == 0
+    engine.update_vehicle_data()
+    assert list(engine.rerouted_vehicles) == ["waiting"]
+    assert engine.reroutes_deferred == 0
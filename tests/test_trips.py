@@ -0,0 +1,89 @@
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+import trips
+from conftest import ROOT
+from engine import TrafficEngine
+from trips import TripTable, parse_trip_file, route_files_from_config
+
+TRIPS = """<routes>
+    <vType id="car" vClass="passenger"/>
+    <trip id="t2" type="car" depart="5.00" from="a" to="b"/>
+    <trip id="t10" depart="0.00" from="b" to="c"/>
+    <trip id="t1" depart="triggered" from="c"/>
+</routes>
+"""
+
+VEHICLES = """<routes>
+    <route id="shared" edges="a b c"/>
+    <vehicle id="v1" depart="3">
+        <route edges="c d a"/>
+    </vehicle>
+    <vehicle id="v0" depart="1" route="shared"/>
+    <trip id="t3" depart="2" from="d" to="a"/>
+</routes>
+"""
+
+
+def old_trip_routes(route_files):
+    """The parser the trip table replaced: every <trip>'s (from, to) through ElementTree."""
+    routes = {}
+    for route_file in route_files:
+        for trip in ET.parse(route_file).getroot().findall(".//trip"):
+            routes[trip.get("id")] = (trip.get("from"), trip.get("to"))
+    return routes
+
+
+def test_trip_table_matches_the_old_parser(tmp_path, monkeypatch):
+    files = []
+    for name, text in (("a.trips.xml", TRIPS), ("b.rou.xml", VEHICLES)):
+        files.append(str(tmp_path / name))
+        (tmp_path / name).write_text(text)
+    # Through the process pool, as for large scenarios
+    monkeypatch.setattr(trips, "PARALLEL_MIN_BYTES", 0)
+    table = TripTable(files, str(tmp_path / "cache"))
+    for vehicle_id, route in old_trip_routes(files).items():
+        assert table.route(vehicle_id) == route
+    assert table.route("v1") == ("c", "a")
+    assert table.route("v0") is None  # references a named route
+    assert table.destination("missing") is None
+    assert len(table) == 5
+
+    cached = TripTable(files, str(tmp_path / "cache"))
+    columns = cached.load()
+    assert isinstance(columns["vehicle_ids"], np.memmap)
+    assert [cached.route(v) for v in columns["vehicle_ids"].tolist()] == \
+        [table.route(v) for v in columns["vehicle_ids"].tolist()]
+    depart = dict(zip(columns["vehicle_ids"].tolist(), columns["depart"].tolist()))
+    assert depart["t2"] == 5.0 and depart["v1"] == 3.0 and np.isnan(depart["t1"])
+
+
+def test_trip_table_matches_the_old_parser_on_the_bundled_scenario(tmp_path):
+    files = route_files_from_config(os.path.join(ROOT, "osm.sumocfg"))
+    table = TripTable(files, str(tmp_path / "cache"))
+    old = old_trip_routes(files)
+    assert old
+    for vehicle_id, route in old.items():
+        assert table.route(vehicle_id) == route
+
+
+def test_malformed_route_file_raises_parse_error(tmp_path):
+    route_file = tmp_path / "bad.trips.xml"
+    route_file.write_text('<routes>\n    <trip id="a" depart="0" from="e1" to="e2">\n</routes>\n')
+    with pytest.raises(ET.ParseError) as error:
+        parse_trip_file(str(route_file))
+    assert error.value.position[0] == 3
+    with pytest.raises(ET.ParseError):
+        TripTable([str(route_file)], str(tmp_path / "cache")).load()
+
+
+def test_engine_runs_on_without_a_malformed_trip_table(tmp_path):
+    route_file = tmp_path / "bad.trips.xml"
+    route_file.write_text("<routes><trip")
+    trips = TripTable([str(route_file)], str(tmp_path / "cache"))
+    engine = TrafficEngine(os.path.join(ROOT, "osm.net.xml.gz"), os.path.join(ROOT, "osm.sumocfg"), trips=trips)
+    assert engine.load_trips() is False
+    assert engine.trips is None
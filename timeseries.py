@@ -0,0 +1,97 @@
+"""Fixed-memory time series for the live charts.
+
+Recent samples are kept at full resolution in a NumPy ring buffer.  Samples
+that fall out of it are folded into min/max buckets, which live in a second
+ring buffer, so an hours-long run still shows its whole history in
+constant memory.
+"""
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity ring of rows (x plus one column per channel)."""
+
+    def __init__(self, capacity, width):
+        self.data = np.zeros((capacity, width))
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, row):
+        """Append row; returns the evicted oldest row when the ring was full, else None."""
+        evicted = None
+        end = (self.start + self.size) % self.capacity
+        if self.size == self.capacity:
+            evicted = self.data[self.start].copy()
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.size += 1
+        self.data[end] = row
+        return evicted
+
+    def ordered(self):
+        """Rows oldest first (a copy when the ring has wrapped)."""
+        end = self.start + self.size
+        if end <= self.capacity:
+            return self.data[self.start:end]
+        return np.concatenate((self.data[self.start:], self.data[:end - self.capacity]))
+
+
+class TimeSeries:
+    """Full-resolution recent window plus min/max-downsampled older history.
+
+    capacity      samples kept at full resolution
+    bucket_size   older samples folded into one bucket (0 disables history)
+    history       number of buckets kept
+    """
+
+    def __init__(self, channels, capacity=2000, bucket_size=50, history=1000):
+        self.channels = channels
+        self.recent = RingBuffer(capacity, channels + 1)
+        self.bucket_size = bucket_size
+        self.history = RingBuffer(history, 2 * channels + 1) if bucket_size else None
+        self._bucket = None
+        self._bucket_count = 0
+
+    def append(self, x, *values):
+        evicted = self.recent.push((x,) + values)
+        if evicted is not None and self.history is not None:
+            self._fold(evicted)
+
+    def _fold(self, row):
+        x, values = row[0], row[1:]
+        if self._bucket is None:
+            self._bucket = np.concatenate(([x], values, values))
+        else:
+            c = self.channels
+            self._bucket[1:c + 1] = np.minimum(self._bucket[1:c + 1], values)
+            self._bucket[c + 1:] = np.maximum(self._bucket[c + 1:], values)
+        self._bucket_count += 1
+        if self._bucket_count == self.bucket_size:
+            self.history.push(self._bucket)
+            self._bucket, self._bucket_count = None, 0
+
+    def arrays(self):
+        """(x, values) for plotting: values has one row per channel.
+
+        Each history bucket contributes two points (its min and its max) so
+        spikes in the downsampled part stay visible.
+        """
+        recent = self.recent.ordered()
+        parts_x, parts_v = [], []
+        if self.history is not None and (len(self.history) or self._bucket is not None):
+            buckets = self.history.ordered()
+            if self._bucket is not None:
+                buckets = np.vstack((buckets, self._bucket))
+            c = self.channels
+            parts_x.append(np.repeat(buckets[:, 0], 2))
+            pairs = np.empty((len(buckets) * 2, c))
+            pairs[0::2] = buckets[:, 1:c + 1]
+            pairs[1::2] = buckets[:, c + 1:]
+            parts_v.append(pairs)
+        parts_x.append(recent[:, 0])
+        parts_v.append(recent[:, 1:])
+        return np.concatenate(parts_x), np.concatenate(parts_v).T
@@ -0,0 +1,216 @@
+"""Compact table of vehicle trips (origin, destination, departure).
+
+The route files listed in the SUMO configuration are streamed through
+expat, in parallel processes when there is enough data to be worth it.
+Edge ids are interned: origin and destination are int32 codes into one
+edge name array, and vehicles are kept sorted by id, so a lookup is a
+binary search.  The columns are cached as .npy files in ``trips.cache/``
+next to the route files, keyed by the SHA-1 of every file, and later runs
+memory-map them instead of parsing XML.
+
+TripTable loads on first use; load() may also be called from a
+background thread to have it ready in advance.
+
+    trips = TripTable(route_files_from_config("osm.sumocfg"))
+    trips.destination("veh12")
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import xml.etree.ElementTree as ET
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from xml.parsers import expat
+
+import numpy as np
+
+from netcache import _open, file_hash
+
+CACHE_VERSION = 1
+FIELDS = ("vehicle_ids", "edge_names", "origin", "destination", "depart")
+# Below this many bytes of XML, starting worker processes costs more than it saves.
+PARALLEL_MIN_BYTES = 8 << 20
+
+
+def files_from_config(config, option):
+    """Files of a .sumocfg option such as "additional-files", resolved against its directory."""
+    base = os.path.dirname(os.path.abspath(config))
+    for _, elem in ET.iterparse(config):
+        if elem.tag == option:
+            return [os.path.join(base, name.strip()) for name in elem.get("value", "").split(",") if name.strip()]
+    return []
+
+
+def route_files_from_config(config):
+    """Route files of a .sumocfg, resolved against its directory."""
+    return files_from_config(config, "route-files")
+
+
+def _depart(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan  # "triggered", "now", ...
+
+
+def parse_trip_file(filename):
+    """(ids, edge_names, origin, destination, depart) of the trips and routed vehicles in one file.
+
+    origin and destination are codes into this file's edge_names (-1 when
+    missing).  expat reports each element's attributes as it starts, so no
+    element tree is built at all.  Malformed XML raises ET.ParseError.
+    """
+    ids = []
+    edge_code = {}
+    origin, destination, depart = array("i"), array("i"), array("d")
+    vehicle = None
+
+    def code(edge):
+        return -1 if edge is None else edge_code.setdefault(edge, len(edge_code))
+
+    def start(tag, attrs):
+        nonlocal vehicle
+        if tag == "trip":
+            ids.append(attrs.get("id"))
+            origin.append(code(attrs.get("from")))
+            destination.append(code(attrs.get("to")))
+            depart.append(_depart(attrs.get("depart")))
+        elif tag == "vehicle":
+            # Vehicles that reference a route by id are not resolved.
+            vehicle = None if "route" in attrs else attrs
+        elif tag == "route" and vehicle is not None:
+            edges = attrs.get("edges", "").split()
+            if edges:
+                ids.append(vehicle.get("id"))
+                origin.append(code(edges[0]))
+                destination.append(code(edges[-1]))
+                depart.append(_depart(vehicle.get("depart")))
+            vehicle = None
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start
+    try:
+        with _open(filename) as f:
+            parser.ParseFile(f)
+    except expat.ExpatError as e:
+        # Raised as ElementTree's error, which callers already handle for malformed XML.
+        error = ET.ParseError(f"{filename}: {expat.ErrorString(e.code)}: line {e.lineno}, column {e.offset}")
+        error.code, error.position = e.code, (e.lineno, e.offset)
+        raise error from None
+    return ids, list(edge_code), origin, destination, depart
+
+
+def compile_trips(filenames, jobs=None):
+    """Parse filenames (concurrently if large) into the table columns."""
+    filenames = list(filenames)
+    size = sum(os.path.getsize(name) for name in filenames)
+    if len(filenames) > 1 and size >= PARALLEL_MIN_BYTES:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parts = list(pool.map(parse_trip_file, filenames))
+    else:
+        parts = [parse_trip_file(name) for name in filenames]
+
+    # Re-intern every file's edge names into one table; slot -1 keeps "missing".
+    edge_code = {}
+    ids, origin, destination, depart = [], [], [], []
+    for part_ids, part_edges, part_origin, part_destination, part_depart in parts:
+        remap = np.array([edge_code.setdefault(e, len(edge_code)) for e in part_edges] + [-1], dtype=np.int32)
+        ids += part_ids
+        origin.append(remap[np.frombuffer(part_origin, dtype=np.int32)])
+        destination.append(remap[np.frombuffer(part_destination, dtype=np.int32)])
+        depart.append(np.frombuffer(part_depart, dtype=np.float64))
+
+    vehicle_ids = np.array(ids, dtype=str)
+    del ids
+    order = np.argsort(vehicle_ids, kind="stable")
+    return {
+        "vehicle_ids": vehicle_ids[order],
+        "edge_names": np.array(list(edge_code), dtype=str),
+        "origin": _concat(origin, np.int32)[order],
+        "destination": _concat(destination, np.int32)[order],
+        "depart": _concat(depart, np.float64)[order],
+    }
+
+
+def _concat(parts, dtype):
+    return np.concatenate(parts) if parts else np.empty(0, dtype)
+
+
+def _digest(filenames):
+    digest = hashlib.sha1(f"v{CACHE_VERSION}".encode())
+    for name in filenames:
+        digest.update(os.path.basename(name).encode() + b"\0" + file_hash(name).encode())
+    return digest.hexdigest()
+
+
+def load_trip_columns(filenames, cache_dir=None):
+    """Table columns for filenames, from the on-disk cache when the files are unchanged."""
+    filenames = list(filenames)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(filenames[0])) if filenames else ".", "trips.cache")
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    digest = _digest(filenames)
+    try:
+        with open(manifest_path) as f:
+            if json.load(f).get("hash") == digest:
+                return {name: np.load(os.path.join(cache_dir, name + ".npy"), mmap_mode="r") for name in FIELDS}
+    except (OSError, ValueError):
+        pass
+
+    columns = compile_trips(filenames)
+    # Every file goes through a private temporary and os.replace, so processes
+    # filling the same cache at once never read a half-written file.
+    suffix = f".{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in FIELDS:
+            path = os.path.join(cache_dir, name + ".npy")
+            with open(path + suffix, "wb") as f:
+                np.save(f, columns[name])
+            os.replace(path + suffix, path)
+        with open(manifest_path + suffix, "w") as f:
+            json.dump({"hash": digest, "files": [os.path.basename(n) for n in filenames]}, f)
+        os.replace(manifest_path + suffix, manifest_path)
+    except OSError as e:
+        print(f"Trip cache not written ({e}); continuing without it.")
+    return columns
+
+
+class TripTable:
+    """Origin/destination/departure per vehicle id, loaded on first use."""
+
+    def __init__(self, filenames, cache_dir=None):
+        self.filenames = list(filenames)
+        self.cache_dir = cache_dir
+        self._columns = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._columns is None:
+                self._columns = load_trip_columns(self.filenames, self.cache_dir)
+        return self._columns
+
+    def __len__(self):
+        return len(self.load()["vehicle_ids"])
+
+    def _row(self, vehicle_id):
+        ids = self.load()["vehicle_ids"]
+        i = int(np.searchsorted(ids, vehicle_id))
+        return i if i < len(ids) and ids[i] == vehicle_id else None
+
+    def route(self, vehicle_id):
+        """(origin edge, destination edge) of the vehicle, or None if it has no trip."""
+        i = self._row(vehicle_id)
+        if i is None:
+            return None
+        columns = self._columns
+        names = columns["edge_names"]
+        a, b = int(columns["origin"][i]), int(columns["destination"][i])
+        return (str(names[a]) if a >= 0 else None, str(names[b]) if b >= 0 else None)
+
+    def destination(self, vehicle_id):
+        route = self.route(vehicle_id)
+        return route[1] if route else None